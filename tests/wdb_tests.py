@@ -0,0 +1,280 @@
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+from urllib.error import URLError
+
+from wikibase.wdb import WbApi, WbCursor, WbDatabase, WbDatabaseConnection, WbSparqlCache, canonical_sparql, \
+    split_sparql_template
+
+
+class FakeApi(WbApi):
+    '''The api without the wikibase, the sparql answers are given'''
+
+    def __init__(self, sparql_error: Exception = None, failed_labels=(), sparql_items: dict = None):
+        self.sparql_error = sparql_error
+        self.sparql_items = sparql_items or {}
+        self.failed_labels = set(failed_labels)
+        self.sparql_retry_counts = []
+        self.searched_labels = []
+        self.written_labels = []
+
+    def execute_sparql_query(self, sparql_query, retry_count=WbApi.DEFAULT_RETRY_COUNT):
+        self.sparql_retry_counts.append(retry_count)
+        if self.sparql_error:
+            raise self.sparql_error
+        return {'head': {'vars': ['entity', 'label']}, 'results': {'bindings': [
+            {'entity': {'value': f'http://wikibase/entity/{item_id}'}, 'label': {'value': label}}
+            for label, item_id in self.sparql_items.items()]}}
+
+    def search_items(self, query):
+        self.searched_labels.append(query['label'])
+        return [{'id': 'Q42', 'label': query['label']}]
+
+    def csrf_token(self):
+        return '+\\'
+
+    def get_and_increase_value(self, claim_id, increment):
+        return 1
+
+
+class FakeCursor(WbCursor):
+    '''The cursor without connection, the model item is given'''
+
+    def __init__(self, api: FakeApi, concrete_model: dict = None):
+        self.api = api
+        self.concrete_model = concrete_model
+        self.connection = SimpleNamespace(invalidate_cache=lambda: None)
+        self._prefix_block = ''
+        self._ns_suffix = ''
+        self._debug_enabled = False
+        self._instance_of_property_id = 1
+        self._django_next_id_p = 'P2'
+        self.rowcount = 0
+        self._position = 0
+
+    def _check_or_create_model(self, model):
+        return self.concrete_model
+
+    def get_and_update_or_create_item_if_not_found_by_name(self, item_name, data=None, csrf_token=None):
+        if item_name in self.api.failed_labels:
+            raise WbDatabase.InternalError(f'The item {item_name} is not saved')
+        self.api.written_labels.append(item_name)
+        return {'id': 'Q1'}
+
+
+CONCRETE_MODEL = {
+    'id': 'Q10',
+    '_numeric_id': 10,
+    '_field_properties': [],
+    '_autofield': (3, 'id'),
+    '_pk': (3, 'id'),
+    'claims': {'P2': [{'id': 'Q10$sequence'}]},
+}
+
+MODEL = {'type': 'test.models.Book', 'application': 'test', 'pk': 'id'}
+
+
+class WriteItemsTest(TestCase):
+
+    def test_foreign_items_are_found_with_one_query(self):
+        api = FakeApi(sparql_items={'Author 1': 'Q7'})
+        resolved_foreign_items = FakeCursor(api)._resolve_foreign_items({'Author 1', 'Author 2'})
+        self.assertEqual(resolved_foreign_items, {'Author 1': 7, 'Author 2': 42})
+        self.assertEqual(api.sparql_retry_counts, [WbApi.BULK_SEARCH_RETRY_COUNT])
+        self.assertEqual(api.searched_labels, ['Author 2'])
+
+    def test_foreign_items_fall_back_to_the_search(self):
+        for sparql_error in (WbDatabase.InternalError('The query service is down'),
+                             URLError('Connection refused')):
+            api = FakeApi(sparql_error=sparql_error)
+            resolved_foreign_items = FakeCursor(api)._resolve_foreign_items({'Author 1'})
+            self.assertEqual(resolved_foreign_items, {'Author 1': 42})
+            self.assertEqual(api.sparql_retry_counts, [WbApi.BULK_SEARCH_RETRY_COUNT])
+            self.assertEqual(api.searched_labels, ['Author 1'])
+
+    def test_not_written_rows_are_not_counted(self):
+        cursor = FakeCursor(FakeApi(failed_labels={'Book:1 in test'}), CONCRETE_MODEL)
+        cursor._add_items({'data': {'model': MODEL}}, [{'title': 'A'}, {'title': 'B'}])
+        self.assertEqual(cursor.rowcount, 1)
+        self.assertEqual(cursor.fetchall(), [[1]])
+
+    def test_written_rows_are_counted(self):
+        api = FakeApi()
+        cursor = FakeCursor(api, CONCRETE_MODEL)
+        cursor._add_items({'data': {'model': MODEL}}, [{'title': 'A'}, {'title': 'B'}])
+        self.assertEqual(cursor.rowcount, 2)
+        self.assertEqual(sorted(api.written_labels), ['Book:1 in test', 'Book:2 in test'])
+
+
+class SplitSparqlTemplateTest(TestCase):
+
+    def test_parts_around_placeholders(self):
+        self.assertEqual(
+            split_sparql_template('SELECT ?a WHERE { ?a pd:P1 %s . ?a pd:P2 %s }'),
+            ('SELECT ?a WHERE { ?a pd:P1 ', ' . ?a pd:P2 ', ' }'))
+
+    def test_escaped_percent(self):
+        self.assertEqual(
+            split_sparql_template("FILTER(CONTAINS(?a, '100%%')) %s%%s"),
+            ("FILTER(CONTAINS(?a, '100%')) ", '%s'))
+
+    def test_without_placeholders(self):
+        self.assertEqual(split_sparql_template('ASK { ?a ?b ?c }'), ('ASK { ?a ?b ?c }',))
+
+
+class SparqlParameterValueTest(TestCase):
+
+    def setUp(self):
+        self.connection = WbDatabaseConnection.__new__(WbDatabaseConnection)
+
+    def test_string_is_escaped(self):
+        self.assertEqual(
+            self.connection.sparql_parameter_value('it\'s "a"\\\n\t'),
+            "'it\\'s \\\"a\\\"\\\\\\n\\t'")
+
+    def test_bool_literals(self):
+        self.assertEqual(self.connection.sparql_parameter_value(True), 'true')
+        self.assertEqual(self.connection.sparql_parameter_value(False), 'false')
+
+    def test_numbers(self):
+        self.assertEqual(self.connection.sparql_parameter_value(42), '42')
+        self.assertEqual(self.connection.sparql_parameter_value(0.5), '0.5')
+
+    def test_none_is_rejected(self):
+        with self.assertRaises(WbDatabase.InternalError):
+            self.connection.sparql_parameter_value(None)
+
+
+class ParameterizedSparqlTest(TestCase):
+
+    def setUp(self):
+        # The query building doesn't use the connection state
+        self.connection = WbDatabaseConnection.__new__(WbDatabaseConnection)
+
+    def test_where_placeholders_are_bound(self):
+        self.assertEqual(
+            self.connection.build_parameterized_sparql(
+                'SELECT ?a WHERE { ?a pd:P1 ?b . FILTER(?b = %s && ?a != %s) }', ['x', 2]),
+            'SELECT ?a WHERE {\n VALUES (?_p0 ?_p1) { (\'x\' 2) }\n ?a pd:P1 ?b . FILTER(?b = ?_p0 && ?a != ?_p1) }')
+
+    def test_placeholders_after_where_are_inlined(self):
+        self.assertEqual(
+            self.connection.build_parameterized_sparql(
+                'SELECT ?a (COUNT(?b) AS ?n) WHERE { ?a pd:P1 ?b . { ?b pd:P2 %s } } '
+                'GROUP BY ?a HAVING (COUNT(?b) > %s) ORDER BY %s', ['x', 3, True]),
+            'SELECT ?a (COUNT(?b) AS ?n) WHERE {\n VALUES (?_p0) { (\'x\') }\n ?a pd:P1 ?b . { ?b pd:P2 ?_p0 } } '
+            'GROUP BY ?a HAVING (COUNT(?b) > 3) ORDER BY true')
+
+    def test_braces_in_literals_are_skipped(self):
+        self.assertEqual(
+            self.connection.build_parameterized_sparql(
+                "SELECT ?a WHERE { ?a pd:P1 '}' } LIMIT %s", [5]),
+            "SELECT ?a WHERE { ?a pd:P1 '}' } LIMIT 5")
+
+    def test_template_without_where_is_inlined(self):
+        self.assertEqual(
+            self.connection.build_parameterized_sparql('ASK { ?a pd:P1 %s }', ["it's"]),
+            "ASK { ?a pd:P1 'it\\'s' }")
+
+    def test_none_is_rejected(self):
+        for template in ('SELECT ?a WHERE { ?a pd:P1 %s }', 'SELECT ?a WHERE { ?a pd:P1 ?b } LIMIT %s',
+                         'ASK { ?a pd:P1 %s }'):
+            with self.assertRaises(WbDatabase.InternalError):
+                self.connection.build_parameterized_sparql(template, [None])
+
+    def test_placeholder_count_mismatch(self):
+        with self.assertRaises(WbDatabase.InternalError):
+            self.connection.build_parameterized_sparql('SELECT ?a WHERE { ?a pd:P1 %s }', [1, 2])
+
+
+class CanonicalSparqlTest(TestCase):
+
+    def test_variables_are_renamed_in_order(self):
+        self.assertEqual(
+            canonical_sparql('SELECT ?book ?author WHERE { ?book pd:P1 ?author . ?author pd:P2 $book }'),
+            'SELECT ?v0 ?v1 WHERE { ?v0 pd:P1 ?v1 . ?v1 pd:P2 ?v0 }')
+
+    def test_renamed_queries_share_the_text(self):
+        self.assertEqual(
+            canonical_sparql('SELECT ?a WHERE { ?a pd:P1 _:x }'),
+            canonical_sparql('SELECT  ?b\nWHERE {\n  ?b pd:P1 _:y  # the comment\n}'))
+
+    def test_column_order_is_kept(self):
+        self.assertNotEqual(
+            canonical_sparql('SELECT ?a ?b WHERE { ?a pd:P1 ?b }'),
+            canonical_sparql('SELECT ?a ?b WHERE { ?b pd:P1 ?a }'))
+
+    def test_literals_and_iris_are_kept(self):
+        self.assertEqual(
+            canonical_sparql("PREFIX pd: <http://x/prop/direct/> SELECT ?a WHERE { ?a pd:P1 '?a  # b' }"),
+            "PREFIX pd: <http://x/prop/direct/> SELECT ?v0 WHERE { ?v0 pd:P1 '?a  # b' }")
+        self.assertNotEqual(
+            canonical_sparql("SELECT ?a WHERE { ?a pd:P1 'x' }"),
+            canonical_sparql("SELECT ?a WHERE { ?a pd:P1 'y' }"))
+
+    def test_comparison_without_spaces_is_not_renamed(self):
+        sparql = 'SELECT ?x WHERE { ?x pd:P1 ?y . FILTER(?x<?y&&?y>2) }'
+        self.assertEqual(canonical_sparql(sparql), sparql)
+        self.assertNotEqual(
+            canonical_sparql(sparql),
+            canonical_sparql('SELECT ?x WHERE { ?x pd:P1 ?z . FILTER(?x<?y&&?y>2) }'))
+
+    def test_comparison_with_spaces_is_renamed(self):
+        self.assertEqual(
+            canonical_sparql('SELECT ?x WHERE { ?x pd:P1 ?y . FILTER(?x < ?y && ?y > 2) }'),
+            'SELECT ?v0 WHERE { ?v0 pd:P1 ?v1 . FILTER(?v0 < ?v1 && ?v1 > 2) }')
+
+
+class SparqlCacheTest(TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch('wikibase.wdb.monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = WbSparqlCache(maxsize=2, ttl=10, pinned_ttl=300, write_lag=60)
+
+    def test_least_recently_used_answer_is_evicted(self):
+        self.cache.put('a', {'answer': 1})
+        self.cache.put('b', {'answer': 2})
+        self.assertEqual(self.cache.get('a'), {'answer': 1})
+        self.cache.put('c', {'answer': 3})
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('a'), {'answer': 1})
+        self.assertEqual(self.cache.get('c'), {'answer': 3})
+
+    def test_pinned_answer_is_not_evicted_by_size(self):
+        self.cache.put('probe', {'answer': 0}, pin=True)
+        for key in ('a', 'b', 'c'):
+            self.cache.put(key, {'answer': key})
+        self.assertEqual(self.cache.get('probe'), {'answer': 0})
+
+    def test_answer_expires(self):
+        self.cache.put('a', {'answer': 1})
+        self.now += 10
+        self.assertEqual(self.cache.get('a'), {'answer': 1})
+        self.now += 0.5
+        self.assertIsNone(self.cache.get('a'))
+        # The expired answer doesn't hold the place of the other ones
+        self.cache.put('b', {'answer': 2})
+        self.cache.put('c', {'answer': 3})
+        self.assertEqual(self.cache.get('b'), {'answer': 2})
+
+    def test_answers_are_not_stored_in_the_write_lag_window(self):
+        self.cache.put('stale', {'answer': 1})
+        self.cache.note_write()
+        self.assertIsNone(self.cache.get('stale'))
+        self.now += 59
+        self.cache.put('lagging', {'answer': 2})
+        self.assertIsNone(self.cache.get('lagging'))
+        self.now += 1
+        self.cache.put('caught up', {'answer': 3})
+        self.assertEqual(self.cache.get('caught up'), {'answer': 3})
+
+    def test_pinned_probe_survives_the_write(self):
+        self.cache.put('probe', {'answer': 1}, pin=True)
+        self.cache.note_write()
+        self.now += 299
+        self.assertEqual(self.cache.get('probe'), {'answer': 1})
+        self.now += 2
+        self.assertIsNone(self.cache.get('probe'))
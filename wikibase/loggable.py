@@ -2,23 +2,29 @@ from logging import DEBUG, ERROR, Logger, getLogger, root
 
 
 class Loggable:
+    # No instance dict for the slotted subclasses
+    __slots__ = ()
 
     logger: Logger = None
 
-    def _init_logger(self):
+    def _init_logger(self) -> Logger:
         self.logger = getLogger(f'{__name__}.{self.__class__.__name__}')
+        return self.logger
 
     def __init__(self):
-        self._init_logger()
+        # The logger is created on the first message
+        ...
+
+    def _get_logger(self) -> Logger:
+        return getattr(self, 'logger', None) or self._init_logger()
+
+    def _is_debug_enabled(self) -> bool:
+        return root.level <= DEBUG and self._get_logger().isEnabledFor(DEBUG)
 
     def debug(self, *args, **kwargs):
         if root.level <= DEBUG:
-            if not self.logger:
-                self._init_logger()
-            self.logger.debug(*args, **kwargs)
+            self._get_logger().debug(*args, **kwargs)
 
     def error(self, *args, **kwargs):
         if root.level <= ERROR:
-            if not self.logger:
-                self._init_logger()
-            self.logger.error(*args, **kwargs)
+            self._get_logger().error(*args, **kwargs)
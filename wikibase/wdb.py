@@ -1,21 +1,28 @@
 from ast import Str
 from binascii import hexlify
-from functools import partial
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from gzip import decompress
 from http.client import HTTPException
-from itertools import chain
+from http.cookiejar import CookieJar
+from itertools import chain, islice
 from json import dumps, loads
 from mimetypes import MimeTypes
+from operator import itemgetter
 from os import stat, urandom
-from time import sleep
-from typing import Any, ByteString, Dict, Iterable, List, Optional, Tuple
-from urllib.error import HTTPError
+from re import compile
+from threading import Lock
+from time import monotonic, sleep
+from typing import Any, ByteString, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.error import HTTPError, URLError
 from urllib.parse import quote_plus
-from urllib.request import Request, urlopen
+from urllib.request import HTTPCookieProcessor, Request, build_opener
 
 from django.apps import apps
 from django.core.files import File
 from django.db.models import Field, Model
-from django.db.models.fields.files import FieldFile, ImageFieldFile
+from django.db.models.fields.files import FieldFile
 
 from .ir.cmd import Cmd
 from .ir.django_model import DjangoModel
@@ -191,26 +198,43 @@ ffd8 ffe0 0010 4a46 4946 0001 0100 0001
 ''')
 
 
+_CSRF_TOKEN_QUERY = 'action=query&meta=tokens&format=json'
+
+
 class WbApi(Loggable):
 
     DEFAULT_RETRY_COUNT = 20
+    # The bulk label probe has the api search as fallback, so it doesn't wait for the query service long
+    BULK_SEARCH_RETRY_COUNT = 3
+    # wbgetentities limit for the ids parameter (non bot accounts)
+    MAX_ENTITIES_PER_REQUEST = 50
 
     def __init__(self, url: str, charset: str = 'utf-8', wdqs_sparql_endpoint: str = None):
         super().__init__()
         self.url = url
         self.charset = charset
         self.wdqs_sparql_endpoint = wdqs_sparql_endpoint if wdqs_sparql_endpoint else f'{url}/sparql'
-        self.cookies = None
-        self.session = None
+        self._api_url = f'{url}/api.php'
+        self._api_base = f'{self._api_url}?'
+        self._csrf_token_url = self._api_base + _CSRF_TOKEN_QUERY
+        # The cookie jar keeps the mediawiki session (and any rotated cookies) between requests
+        self.cookies = CookieJar()
+        self._opener = build_opener(HTTPCookieProcessor(self.cookies))
+        # The api and sparql answers are json, they are compressed well
+        self._opener.addheaders.append(('Accept-Encoding', 'gzip'))
+
+    def _read(self, response) -> dict:
+        body = response.read()
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = decompress(body)
+        return loads(body.decode(self.charset))
 
     def _retry(self, countdown: int, request: Request) -> dict:
         search_result = {}
         for i in range(0, countdown):
-            if self.session:
-                request.headers['Cookie'] = self.session
             try:
-                response = urlopen(request)
-                search_result = loads(response.read().decode(self.charset))
+                response = self._opener.open(request)
+                search_result = self._read(response)
                 if 'error' in search_result and 'code' in search_result['error'] and \
                         (search_result['error']['code'] == 'failed-save' or search_result['error']['code'] == 'no-automatic-entity-id'):
                     sleep(1.27 ** i)
@@ -231,24 +255,19 @@ class WbApi(Loggable):
                 sleep(1.27 ** i)
                 continue
 
-            # Handle session
-            if 'Set-Cookie' in response.headers:
-                self.cookies = response.headers['Set-Cookie']
-                if 'session' in response.headers['Set-Cookie']:
-                    self.session = str(self.cookies).split(';')[0]
             return search_result
         raise WbDatabase.InternalError(
             f'Countdown exceeds limit {countdown}. The last search result is {search_result}.')
 
     def mediawiki_info(self):
-        return loads(urlopen(
-            f'{self.url}/api.php?action=query&meta=siteinfo&format=json').read().decode(self.charset))
+        return self._read(self._opener.open(
+            self._api_base + 'action=query&meta=siteinfo&format=json'))
 
     def search_items(self, query):
         if 'label' in query:
             label_search_string = query['label']
             search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-                f'{self.url}/api.php?action=wbsearchentities&search={quote_plus(label_search_string)}&language=en&type=item&format=json',
+                self._api_base + f'action=wbsearchentities&search={quote_plus(label_search_string)}&language=en&type=item&format=json',
                 method='GET'))
             if not 'search' in search_result:
                 raise WbDatabase.InternalError(f'Wrong response: {dumps(search_result)}')
@@ -259,33 +278,36 @@ class WbApi(Loggable):
         if 'label' in query:
             label_search_string = query['label']
             search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-                f'{self.url}/api.php?action=wbsearchentities&search={quote_plus(label_search_string)}&language=en&type=property&format=json',
+                self._api_base + f'action=wbsearchentities&search={quote_plus(label_search_string)}&language=en&type=property&format=json',
                 method='GET'))
             if not 'search' in search_result:
                 raise WbDatabase.InternalError(f'Wrong response: {dumps(search_result)}')
             return search_result['search']
         raise WbDatabase.InternalError('Only search by label implemented')
 
-    def new_item(self, data):
+    def csrf_token(self) -> str:
         retrieve_csrf_token = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=query&meta=tokens&format=json'))
-        csrf_token = retrieve_csrf_token['query']['tokens']['csrftoken']
+            self._csrf_token_url))
+        return retrieve_csrf_token['query']['tokens']['csrftoken']
+
+    def new_item(self, data, csrf_token: str = None):
+        if csrf_token is None:
+            csrf_token = self.csrf_token()
         post_request_body = f'token={quote_plus(csrf_token)}&data={quote_plus(dumps(data))}'
         search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=wbeditentity&new=item&format=json', method='POST', data=post_request_body.encode('utf-8')))
+            self._api_base + 'action=wbeditentity&new=item&format=json', method='POST', data=post_request_body.encode('utf-8')))
         # TODO: push item to the sparql with INSERT QUERY
         # Or just catch Updater work and use sparql point with update=... request
         if not 'entity' in search_result:
             raise WbDatabase.InternalError(f'Wrong response: {dumps(search_result)}')
         return search_result['entity']
 
-    def update_item(self, id: int, data):
-        retrieve_csrf_token = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=query&meta=tokens&format=json'))
-        csrf_token = retrieve_csrf_token['query']['tokens']['csrftoken']
+    def update_item(self, id: int, data, csrf_token: str = None):
+        if csrf_token is None:
+            csrf_token = self.csrf_token()
         post_request_body = f'token={quote_plus(csrf_token)}&data={quote_plus(dumps(data))}'
         search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=wbeditentity&id=Q{id}&format=json', method='POST', data=post_request_body.encode('utf-8')))
+            self._api_base + f'action=wbeditentity&id=Q{id}&format=json', method='POST', data=post_request_body.encode('utf-8')))
         # TODO: push item to the sparql with INSERT QUERY
         # Or just catch Updater work and use sparql point with update=... request
         if not 'entity' in search_result:
@@ -294,54 +316,64 @@ class WbApi(Loggable):
 
     def new_property(self, data):
         retrieve_csrf_token = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=query&meta=tokens&format=json'))
+            self._csrf_token_url))
         csrf_token = retrieve_csrf_token['query']['tokens']['csrftoken']
         post_request_body = f'token={quote_plus(csrf_token)}'
         search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=wbeditentity&new=property&data={quote_plus(dumps(data))}&format=json', method='POST', data=post_request_body.encode('utf-8')))
+            self._api_base + f'action=wbeditentity&new=property&data={quote_plus(dumps(data))}&format=json', method='POST', data=post_request_body.encode('utf-8')))
         return search_result['entity']
 
     def get_item_claims(self, numeric_entity_id: int, numeric_property_id: int = None):
         search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=wbgetclaims&entity=Q{numeric_entity_id}&format=json' +
+            self._api_base + f'action=wbgetclaims&entity=Q{numeric_entity_id}&format=json' +
             (f'&poperty=P{numeric_property_id}' if numeric_property_id else ''),
             method='GET'))
         if not 'claims' in search_result:
             raise WbDatabase.InternalError(f'Wrong response: {dumps(search_result)}')
         return search_result['claims']
 
-    def get_entities(self, wb_links: List[WbLink]) -> List[dict]:
-        if not wb_links:
-            return []
-        entities_ids = '|'.join([wb_link.get_entity_id()
-                                for wb_link in wb_links])
-        search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=wbgetentities&ids={entities_ids}&format=json',
-            method='GET'))
-        if not 'entities' in search_result:
-            raise WbDatabase.InternalError(f'Wrong response: {dumps(search_result)}')
-        return search_result['entities'].values()
+    def get_entities(self, wb_links: List[WbLink], props: str = None, languages: str = None) -> List[dict]:
+        return self.get_entities_by_ids(
+            ((wb_link['entity_type'], wb_link['id']) for wb_link in wb_links), props, languages)
+
+    def get_entities_by_ids(self, ids: Iterable[Tuple[str, int]],
+                            props: str = None, languages: str = None) -> List[dict]:
+        entities_ids = [f'{WbLink._entity_prefix(entity_type)}{id}'
+                        for entity_type, id in ids]
+        filters = (f'&props={quote_plus(props)}' if props else '') + \
+            (f'&languages={quote_plus(languages)}' if languages else '')
+        result = []
+        for offset in range(0, len(entities_ids), WbApi.MAX_ENTITIES_PER_REQUEST):
+            ids_parameter = '|'.join(
+                entities_ids[offset:offset + WbApi.MAX_ENTITIES_PER_REQUEST])
+            search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
+                self._api_base + f'action=wbgetentities&ids={ids_parameter}{filters}&format=json',
+                method='GET'))
+            if not 'entities' in search_result:
+                raise WbDatabase.InternalError(f'Wrong response: {dumps(search_result)}')
+            result.extend(search_result['entities'].values())
+        return result
 
     def new_claim(self, entity_type: str, entity_id: int, property_id: int, value: Any) -> dict:
         entity_id = f'{WbLink._entity_prefix(entity_type)}{entity_id}'
         snak_type = 'value' if value else 'novalue'
 
         retrieve_csrf_token = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=query&meta=tokens&format=json'))
+            self._csrf_token_url))
         csrf_token = retrieve_csrf_token['query']['tokens']['csrftoken']
         post_request_body = f'token={quote_plus(csrf_token)}'
         search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=wbcreateclaim&entity={entity_id}&property=P{property_id}&snaktype={snak_type}&format=json' +
+            self._api_base + f'action=wbcreateclaim&entity={entity_id}&property=P{property_id}&snaktype={snak_type}&format=json' +
             (f'&value={quote_plus(dumps(value))}' if value else ''), method='POST', data=post_request_body.encode('utf-8')))
         return search_result['claim']
 
     def get_and_increase_value(self, claim_id: str, increase_step: int) -> int:
         retrieve_csrf_token = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=query&meta=tokens&format=json'))
+            self._csrf_token_url))
         csrf_token = retrieve_csrf_token['query']['tokens']['csrftoken']
 
         search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=wbgetclaims&claim={claim_id}&format=json',
+            self._api_base + f'action=wbgetclaims&claim={claim_id}&format=json',
             method='GET'))
         if not 'claims' in search_result:
             raise WbDatabase.InternalError(f'Wrong response: {dumps(search_result)}')
@@ -351,7 +383,7 @@ class WbApi(Loggable):
             value['amount'] = result + increase_step
             post_request_body = f'token={quote_plus(csrf_token)}'
             self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-                f'{self.url}/api.php?action=wbsetclaimvalue&claim={claim_id}&snaktype=value&&value={quote_plus(dumps(value))}&format=json', method='POST', data=post_request_body.encode('utf-8')))
+                self._api_base + f'action=wbsetclaimvalue&claim={claim_id}&snaktype=value&&value={quote_plus(dumps(value))}&format=json', method='POST', data=post_request_body.encode('utf-8')))
 
             return result
 
@@ -360,11 +392,11 @@ class WbApi(Loggable):
 
     def set_integer_value_if_less_then_current_value(self, claim_id: str, value: int) -> int:
         retrieve_csrf_token = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=query&meta=tokens&format=json'))
+            self._csrf_token_url))
         csrf_token = retrieve_csrf_token['query']['tokens']['csrftoken']
 
         search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=wbgetclaims&claim={claim_id}&format=json',
+            self._api_base + f'action=wbgetclaims&claim={claim_id}&format=json',
             method='GET'))
         if not 'claims' in search_result:
             raise WbDatabase.InternalError(f'Wrong response: {dumps(search_result)}')
@@ -375,7 +407,7 @@ class WbApi(Loggable):
             datavalue['amount'] = value
             post_request_body = f'token={quote_plus(csrf_token)}'
             self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-                f'{self.url}/api.php?action=wbsetclaimvalue&claim={claim_id}&snaktype=value&&value={quote_plus(dumps(datavalue))}&format=json', method='POST', data=post_request_body.encode('utf-8')))
+                self._api_base + f'action=wbsetclaimvalue&claim={claim_id}&snaktype=value&&value={quote_plus(dumps(datavalue))}&format=json', method='POST', data=post_request_body.encode('utf-8')))
 
             return value
 
@@ -384,7 +416,7 @@ class WbApi(Loggable):
 
     def get_claim_value(self, claim_id: str) -> Dict:
         search_result = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=wbgetclaims&claim={claim_id}&format=json',
+            self._api_base + f'action=wbgetclaims&claim={claim_id}&format=json',
             method='GET'))
         if not 'claims' in search_result:
             raise WbDatabase.InternalError(f'Wrong response: {dumps(search_result)}')
@@ -403,15 +435,6 @@ class WbApi(Loggable):
         raise WbDatabase.InternalError(
             f'Sorry, I can\'t generate empty content for the {guessed_mime_types}')
 
-    def read_chunks(self, file_object, chunk_size):
-        '''Return the next chunk of the file'''
-
-        while True:
-            data = file_object.read(chunk_size)
-            if not data:
-                break
-            yield data
-
     @staticmethod
     def _build_part(item, sep_boundary):
         key, values = item
@@ -454,7 +477,7 @@ class WbApi(Loggable):
     def login(self, credentials: WbCredentials) -> Dict:
         login_token_response = self._retry(WbApi.DEFAULT_RETRY_COUNT,
                                            Request(
-                                               f'{self.url}/api.php?action=query&meta=tokens&type=login&format=json',
+                                               self._api_base + 'action=query&meta=tokens&type=login&format=json',
                                                method='GET'))
         data, content_type = self.encode_multipart_formdata({
             'action': 'login',
@@ -465,7 +488,7 @@ class WbApi(Loggable):
         })
         login_response = self._retry(WbApi.DEFAULT_RETRY_COUNT,
                                      Request(
-                                         f'{self.url}/api.php',
+                                         self._api_url,
                                          method='POST',
                                          data=data,
                                          headers={'Content-Type': content_type}))
@@ -488,7 +511,7 @@ class WbApi(Loggable):
             # Empty file is not upload to the mediawiki
             return
 
-        chunks = self.read_chunks(file_object, chunk_size)
+        chunks = iter(partial(file_object.read, chunk_size), b'')
         chunk = next(chunks)
 
         index = 0
@@ -507,7 +530,7 @@ class WbApi(Loggable):
         data, content_type = self.encode_multipart_formdata(params)
         chunk_upload_result = self._retry(WbApi.DEFAULT_RETRY_COUNT,
                                           Request(
-                                              f'{self.url}/api.php',
+                                              self._api_url,
                                               method='POST',
                                               data=data,
                                               headers={'Content-Type': content_type, 'Content-Disposition': '{}.jpg'.format(index)}))
@@ -530,7 +553,7 @@ class WbApi(Loggable):
             data, content_type = self.encode_multipart_formdata(params)
             chunk_upload_result = self._retry(WbApi.DEFAULT_RETRY_COUNT,
                                               Request(
-                                                  f'{self.url}/api.php',
+                                                  self._api_url,
                                                   method='POST',
                                                   data=data,
                                                   headers={'Content-Type': content_type}))
@@ -549,7 +572,7 @@ class WbApi(Loggable):
         data, content_type = self.encode_multipart_formdata(params)
         chunk_upload_result = self._retry(WbApi.DEFAULT_RETRY_COUNT,
                                           Request(
-                                              f'{self.url}/api.php',
+                                              self._api_url,
                                               method='POST',
                                               data=data,
                                               headers={'Content-Type': content_type}))
@@ -561,7 +584,7 @@ class WbApi(Loggable):
         self.login(credentials)
 
         retrieve_csrf_token = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=query&meta=tokens&format=json'))
+            self._csrf_token_url))
         csrf_token = retrieve_csrf_token['query']['tokens']['csrftoken']
         # post_request_body = f'token={quote_plus(csrf_token)}'
 
@@ -575,7 +598,7 @@ class WbApi(Loggable):
         self.login(credentials)
 
         retrieve_csrf_token = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=query&meta=tokens&format=json'))
+            self._csrf_token_url))
         csrf_token = retrieve_csrf_token['query']['tokens']['csrftoken']
         # post_request_body = f'token={quote_plus(csrf_token)}'
 
@@ -590,7 +613,7 @@ class WbApi(Loggable):
         self.login(credentials)
 
         retrieve_csrf_token = self._retry(WbApi.DEFAULT_RETRY_COUNT, Request(
-            f'{self.url}/api.php?action=query&meta=tokens&format=json'))
+            self._csrf_token_url))
         csrf_token = retrieve_csrf_token['query']['tokens']['csrftoken']
         data, content_type = self.encode_multipart_formdata({
             'action': 'upload',
@@ -603,15 +626,15 @@ class WbApi(Loggable):
 
         upload_result = self._retry(WbApi.DEFAULT_RETRY_COUNT,
                                     Request(
-                                        f'{self.url}/api.php',
+                                        self._api_url,
                                         method='POST',
                                         data=data,
                                         headers={'Content-Type': content_type}))
 
         return upload_result
 
-    def execute_sparql_query(self, sparql_query: str) -> Dict:
-        execute_result = self._retry(WbApi.DEFAULT_RETRY_COUNT,
+    def execute_sparql_query(self, sparql_query: str, retry_count: int = DEFAULT_RETRY_COUNT) -> Dict:
+        execute_result = self._retry(retry_count,
                                      Request(
                                          f'{self.wdqs_sparql_endpoint}?format=json',
                                          method='POST',
@@ -623,28 +646,470 @@ class WbApi(Loggable):
 
         return execute_result
 
+    def search_entities_bulk(self, labels: Iterable[str], entity_type: str = None) -> Dict[str, List[str]]:
+        '''Ids of the entities by english label, found with one sparql query
+
+        The labels without entities are missed in the result (the query service can lag behind the recent edits).
+        '''
+        values = ' '.join(
+            f'{dumps(label, ensure_ascii=False)}@en' for label in labels)
+        entity_type_pattern = f' ; a wikibase:{entity_type.capitalize()}' if entity_type else ''
+        answer = self.execute_sparql_query(f'''
+            PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+            PREFIX wikibase: <http://wikiba.se/ontology#>
+            SELECT ?entity ?label WHERE {{
+                VALUES ?label {{ {values} }}
+                ?entity rdfs:label ?label{entity_type_pattern} .
+            }}
+        ''', WbApi.BULK_SEARCH_RETRY_COUNT)
+        entity_ids = {}
+        for binding in answer['results']['bindings']:
+            entity_ids.setdefault(binding['label']['value'], []).append(
+                binding['entity']['value'].rpartition('/')[2])
+        return entity_ids
+
+    def try_search_entities_bulk(self, labels: Iterable[str], entity_type: str = None) -> Dict[str, List[str]]:
+        '''The same as search_entities_bulk, but the failed (or unreachable) query service gives no entities
+
+        The callers have the api search as fallback for the labels missed in the result.
+        '''
+        try:
+            return self.search_entities_bulk(labels, entity_type)
+        except (WbDatabase.InternalError, URLError) as e:
+            self.error(e)
+            return {}
+
+
+# Properties are only read for the english label and the datatype, so they are loaded
+# without claims, descriptions and aliases (full entities are loaded for items only)
+_PROPERTY_PROPS = 'labels|datatype'
+_PROPERTY_LANGUAGES = 'en'
+
+
+class WbPropertyCache(dict):
+    '''Wikibase properties by numeric id, a miss loads the property from the api'''
+
+    def __init__(self, api: WbApi):
+        super().__init__()
+        self.api = api
+
+    def __missing__(self, wikibase_property_id: int) -> Dict:
+        for wikibase_property in self.api.get_entities_by_ids(
+                [('property', wikibase_property_id)], _PROPERTY_PROPS, _PROPERTY_LANGUAGES):
+            if 'missing' in wikibase_property:
+                break
+            self[wikibase_property_id] = wikibase_property
+            return wikibase_property
+        raise WbDatabase.InternalError(
+            f'Sorry, I can\'t find wikibase_property  by id {wikibase_property_id}')
+
+
+class WbSparqlCache:
+    '''SPARQL answers by query (LRU with time to live), the pinned answers are not evicted by size
+
+    The query service lags behind the edits, so the answers are not stored for write_lag seconds after
+    the last local write (they can miss the write yet). The writes of the other processes are seen when
+    the answer expires, so the ttl of the not pinned answers is short.
+    '''
+
+    def __init__(self, maxsize: int, ttl: float, pinned_ttl: float, write_lag: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.pinned_ttl = pinned_ttl
+        self.write_lag = write_lag
+        self._answers = OrderedDict()
+        self._pinned_answers = {}
+        self._last_write = None
+        self._lock = Lock()
+
+    def get(self, key: Tuple[str, str]) -> Optional[Dict]:
+        now = monotonic()
+        with self._lock:
+            entry = self._pinned_answers.get(key) or self._answers.get(key)
+            if entry is None:
+                return None
+            expires_at, answer = entry
+            if expires_at < now:
+                self._pinned_answers.pop(key, None)
+                self._answers.pop(key, None)
+                return None
+            if key in self._answers:
+                self._answers.move_to_end(key)
+            return answer
+
+    def put(self, key: Tuple[str, str], answer: Dict, pin: bool = False):
+        now = monotonic()
+        with self._lock:
+            if pin:
+                self._pinned_answers[key] = (now + self.pinned_ttl, answer)
+                return
+            if self._last_write is not None and now - self._last_write < self.write_lag:
+                return
+            self._answers[key] = (now + self.ttl, answer)
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.maxsize:
+                self._answers.popitem(last=False)
+
+    def note_write(self):
+        '''Forget the answers (the pinned connection probes are kept) and open the write lag window'''
+        with self._lock:
+            self._answers.clear()
+            self._last_write = monotonic()
+
+
+# The braces of the query text, the string literals are skipped
+_SPARQL_BRACES = compile(r"""'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*"|[{}]""")
+
+
+def _sparql_group_depth(sparql: str, depth: int) -> int:
+    '''The group depth after the query text which starts at the given depth'''
+    for match in _SPARQL_BRACES.finditer(sparql):
+        token = match.group()
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+    return depth
+
+
+class WbNamedLocks:
+    '''One lock per name (the names are never released, there are as many as the model fields)'''
+
+    def __init__(self):
+        self._locks = {}
+        self._lock = Lock()
+
+    def __call__(self, name: str) -> Lock:
+        with self._lock:
+            return self._locks.setdefault(name, Lock())
+
+
+@lru_cache(maxsize=1024)
+def split_sparql_template(template: str) -> Tuple[str, ...]:
+    '''The parts of the template around the %s placeholders ('%%' is unescaped to '%')
+
+    The compiler builds a new command for every execution, so the parts are cached by the template text.
+    '''
+    parts = ['']
+    for escaped_index, chunk in enumerate(template.split('%%')):
+        if escaped_index:
+            parts[-1] += '%'
+        first_part, *next_parts = chunk.split('%s')
+        parts[-1] += first_part
+        parts.extend(next_parts)
+    return tuple(parts)
+
+
+# Tokens of the query text: literals and iris are kept as they are, whitespace and comments are collapsed
+_SPARQL_TOKENS = compile(r"""(?xs)
+    (?P<literal>\'\'\'.*?\'\'\' | \"\"\".*?\"\"\"
+        | '(?:[^'\\\n]|\\.)*' | "(?:[^"\\\n]|\\.)*"
+        | <[^<>"{}|^`\\\s]*>)
+    | (?P<space>(?:\s|\#[^\n]*)+)
+    | [?$](?P<variable>\w+)
+    | _:(?P<blank_node>[\w-]+)
+""")
+
+
+@lru_cache(maxsize=1024)
+def canonical_sparql(sparql_query: str) -> str:
+    '''The query text with the variables and blank nodes renamed in order of appearance
+
+    The queries equal up to the names of variables have the same canonical text (and the same column order).
+    The query is returned as it is when an iri-like token contains a variable mark: a comparison without
+    spaces (?x<?y&&?y>2) looks like an iri, and the variables inside it can't be renamed.
+    '''
+    variables = {}
+    blank_nodes = {}
+    renamed_everywhere = True
+
+    def canonical_token(match) -> str:
+        nonlocal renamed_everywhere
+        if match.group('space') is not None:
+            return ' '
+        variable = match.group('variable')
+        if variable is not None:
+            return '?v' + str(variables.setdefault(variable, len(variables)))
+        blank_node = match.group('blank_node')
+        if blank_node is not None:
+            return '_:b' + str(blank_nodes.setdefault(blank_node, len(blank_nodes)))
+        literal = match.group('literal')
+        if literal[0] == '<' and ('?' in literal or '$' in literal):
+            renamed_everywhere = False
+        return literal
+
+    canonical_query = _SPARQL_TOKENS.sub(canonical_token, sparql_query).strip()
+    return canonical_query if renamed_everywhere else sparql_query
+
+
+class WikibaseInfo:
+    '''The bootstrap entities of the wikibase and the caches shared by the cursors of a connection'''
+
+    __slots__ = (
+        'base_url',
+        'mediawiki_version',
+        'instance_of',
+        'subclass_of',
+        'django_model',
+        'python_type',
+        'sql_table',
+        'django_namespace',
+        'django_application',
+        'django_field',
+        'django_sequence',
+        'django_next_id',
+        'django_models',
+        'sparql_endpoint',
+        'wikibase_properties',
+        'wikibase_credentials',
+        'checked_models',
+        'wikibase_properties_by_name',
+        'property_name_locks',
+        'models_by_label',
+    )
+
+    # The former dictionary keys (see WbDatabaseConnection.db_info)
+    KEYS = {
+        WbDatabase._BASE_URL: 'base_url',
+        WbDatabase._MEDIAWIKI_VERSION: 'mediawiki_version',
+        WbDatabase._INSTANCE_OF: 'instance_of',
+        WbDatabase._SUBCLASS_OF: 'subclass_of',
+        WbDatabase._DJANGO_MODEL: 'django_model',
+        WbDatabase._DJANGO_NAMESPACE: 'django_namespace',
+        WbDatabase._DJANGO_APPLICATION: 'django_application',
+        WbDatabase._PYTHON_TYPE: 'python_type',
+        WbDatabase._SQL_TABLE: 'sql_table',
+        WbDatabase._DJANGO_FIELD: 'django_field',
+        WbDatabase._DJANGO_SEQUENCE: 'django_sequence',
+        WbDatabase._DJANGO_NEXT_ID: 'django_next_id',
+        WbDatabase._DJANGO_MODELS: 'django_models',
+        WbDatabase._SPARQL_ENDPOINT: 'sparql_endpoint',
+        WbDatabase._WIKIBASE_PROPERTIES: 'wikibase_properties',
+        WbDatabase._WIKIBASE_CREDENTIALS: 'wikibase_credentials',
+    }
+
+    def __init__(self, base_url: str, mediawiki_version: str,
+                 instance_of: WbLink, subclass_of: WbLink, django_model: WbLink,
+                 python_type: WbLink, sql_table: WbLink, django_namespace: WbLink,
+                 django_application: WbLink, django_field: WbLink, django_sequence: WbLink,
+                 django_next_id: WbLink, sparql_endpoint: str,
+                 wikibase_properties: WbPropertyCache, wikibase_credentials: WbCredentials):
+        self.base_url = base_url
+        self.mediawiki_version = mediawiki_version
+        self.instance_of = instance_of
+        self.subclass_of = subclass_of
+        self.django_model = django_model
+        self.python_type = python_type
+        self.sql_table = sql_table
+        self.django_namespace = django_namespace
+        self.django_application = django_application
+        self.django_field = django_field
+        self.django_sequence = django_sequence
+        self.django_next_id = django_next_id
+        self.django_models: Dict[str, DjangoModel] = {}
+        self.sparql_endpoint = sparql_endpoint
+        self.wikibase_properties = wikibase_properties
+        self.wikibase_credentials = wikibase_credentials
+        self.checked_models: Dict[Tuple[str, str, str], Dict] = {}
+        self.wikibase_properties_by_name: Dict[str, Dict] = {}
+        self.property_name_locks = WbNamedLocks()
+        # The application and model items by their labels
+        self.models_by_label: Dict[str, Dict] = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        attribute = WikibaseInfo.KEYS.get(key)
+        return getattr(self, attribute, default) if attribute else default
+
+
+# Shared by the connections of the process, the key has the sparql endpoint
+_SPARQL_CACHE = WbSparqlCache(maxsize=1024, ttl=10, pinned_ttl=300, write_lag=60)
+
+
+@lru_cache(maxsize=4096)
+def django_field_name_from_wikibase_property_name(wikibase_property_name: str) -> str:
+    result = wikibase_property_name.strip()
+    if 'ForeignKey' in wikibase_property_name:
+        # DjangoProperty._property_name
+        return f'{result[:result.index(" ")]}_id'
+    return result[:result.index(' ')]
+
+
+def wikibase_entity_name(wikibase_entity: dict) -> str:
+    return wikibase_entity[
+        'label'] if 'label' in wikibase_entity else wikibase_entity['labels']['en']['value']
+
+
+@lru_cache(maxsize=1024)
+def general_model_label(application: str, namespace_suffix: str) -> str:
+    return f'{application}{namespace_suffix}'
+
+
+@lru_cache(maxsize=1024)
+def model_name(model_type: str) -> str:
+    return model_type.rpartition('.')[2]
+
+
+@lru_cache(maxsize=1024)
+def model_label(model_type: str, application: str, namespace_suffix: str) -> str:
+    return f'{model_name(model_type)} in {general_model_label(application, namespace_suffix)}'
+
+
+def instance_of_model_label(model_type: str, application: str, namespace_suffix: str, pk: Any) -> str:
+    return f'{model_name(model_type)}:{pk} in {general_model_label(application, namespace_suffix)}'
+
+
+class _PropertyIdStrings(dict):
+    ''''P<id>' strings by numeric property id, built once per id'''
+
+    def __missing__(self, numeric_property_id: int) -> str:
+        property_id = self[numeric_property_id] = f'P{numeric_property_id}'
+        return property_id
+
+
+_p = _PropertyIdStrings().__getitem__
+
+
+@lru_cache(maxsize=4096)
+def entity_numeric_id(entity_id: str) -> int:
+    '''Numeric part of the 'Q<id>'/'P<id>' entity id, parsed once per id'''
+    return int(entity_id[1:])
+
+
+def _claim_numeric_id(claim: Dict) -> int:
+    return claim['mainsnak']['datavalue']['value']['numeric-id']
+
+
+def _novalue_snak(numeric_property_id: int) -> Dict:
+    return {'snaktype': 'novalue', 'property': _p(numeric_property_id)}
+
+
+def _value_snak(numeric_property_id: int, datavalue_type: str, value: Any) -> Dict:
+    return {'snaktype': 'value', 'property': _p(numeric_property_id),
+            'datavalue': {'value': value, 'type': datavalue_type}}
+
+
+def _statement(mainsnak: Dict) -> Dict:
+    # Statements are built fresh on every call: merging assigns claim ids into them
+    return {'mainsnak': mainsnak, 'type': 'statement', 'rank': 'normal'}
+
+
+# Escape sequences of the SPARQL string literals (ECHAR)
+_SPARQL_STRING_ESCAPES = str.maketrans({
+    '\\': '\\\\', "'": "\\'", '"': '\\"',
+    '\n': '\\n', '\r': '\\r', '\t': '\\t',
+    '\b': '\\b', '\f': '\\f',
+})
+
+_binding_value = itemgetter('value')
+
+_XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+# Literal datatypes answered as python ints (COUNT and the other integer aggregates)
+_INTEGER_DATATYPES = frozenset(_XSD + datatype for datatype in (
+    'integer', 'int', 'long', 'short', 'byte',
+    'nonNegativeInteger', 'positiveInteger', 'nonPositiveInteger', 'negativeInteger',
+    'unsignedLong', 'unsignedInt', 'unsignedShort', 'unsignedByte'))
+
+
+def _binding_integer(binding: Dict) -> Any:
+    # The column type is taken from the first row, the other rows are checked on the fly
+    value = binding['value']
+    return int(value) if binding.get('datatype') in _INTEGER_DATATYPES else value
+
+
+def _apply(convert, binding: Dict) -> Any:
+    return convert(binding)
+
+
+def _binding_converters(vars: list, first_binding: Dict) -> list:
+    '''Converter per column, the strings, decimals and uris are passed as they are'''
+    return [_binding_integer if (first_binding.get(var) or {}).get('datatype') in _INTEGER_DATATYPES
+            else _binding_value for var in vars]
+
+# Datavalue types of the wikibase datatypes which differ from the datatype name
+_DATATYPE_WIRE = {
+    'commonsMedia': 'string',
+    'wikibase-item': 'wikibase-entityid',
+}
+
 
 close_id: int = 0
 
 
 class WbCursor(Loggable):
+    __slots__ = (
+        'logger',
+        'connection',
+        'prefixes',
+        '_prefix_block',
+        'wikibase_info',
+        'django_namespace',
+        '_base_url',
+        '_ns_suffix',
+        'api',
+        '_instance_of_property_id',
+        '_subclass_of_property_id',
+        '_django_model_item_id',
+        '_python_type_property_id',
+        '_sql_table_property_id',
+        '_django_namespace_property_id',
+        '_django_application_property_id',
+        '_django_field_property_id',
+        '_django_sequence_property_id',
+        '_django_next_id_property_id',
+        '_django_field_p',
+        '_django_sequence_p',
+        '_django_next_id_p',
+        '_wikibase_property',
+        '_rows',
+        '_position',
+        'rowcount',
+        '_debug_enabled',
+    )
+
+    BULK_UPSERT_WORKERS = 8
+    MODEL_PROPERTY_WORKERS = 8
+    # The empty field values are written as 'novalue' snaks (it clears the stored value on update)
+    _emit_novalue_snaks = True
 
     def __init__(self, connection):
         super().__init__()
+        self.connection = connection
         self.prefixes: List[str] = connection.prefixes()
-        self.wikibase_info: dict = connection.wikibase_info
+        self._prefix_block: str = connection._prefix_block
+        self.wikibase_info: WikibaseInfo = connection.wikibase_info
         self.django_namespace: str = connection.django_namespace
+        self._base_url: str = connection.wikibase_info.base_url
+        self._ns_suffix: str = f' for {connection.django_namespace}' if connection.django_namespace else ''
         self.api: WbApi = connection.api
-        self.result: Iterable = []
+        # The bootstrap properties/items are never changed after the connection created
+        wikibase_info = connection.wikibase_info
+        self._instance_of_property_id: int = wikibase_info.instance_of['id']
+        self._subclass_of_property_id: int = wikibase_info.subclass_of['id']
+        self._django_model_item_id: int = wikibase_info.django_model['id']
+        self._python_type_property_id: int = wikibase_info.python_type['id']
+        self._sql_table_property_id: int = wikibase_info.sql_table['id']
+        self._django_namespace_property_id: int = wikibase_info.django_namespace['id']
+        self._django_application_property_id: int = wikibase_info.django_application['id']
+        self._django_field_property_id: int = wikibase_info.django_field['id']
+        self._django_sequence_property_id: int = wikibase_info.django_sequence['id']
+        self._django_next_id_property_id: int = wikibase_info.django_next_id['id']
+        self._django_field_p: str = _p(self._django_field_property_id)
+        self._django_sequence_p: str = _p(self._django_sequence_property_id)
+        self._django_next_id_p: str = _p(self._django_next_id_property_id)
+        self._wikibase_property = self.wikibase_info.wikibase_properties.__getitem__
+        self._rows: Iterator = iter(())
         self._position: int = 0
         self.rowcount: int = 0
+        # Skips the debug calls (and their arguments formatting) for the cursor life
+        self._debug_enabled: bool = self._is_debug_enabled()
 
     def close(self):
         global close_id
         close_id += 1
         print(f'close{close_id}')
 
-    def get_and_update_or_create_item_if_not_found_by_name(self, item_name: str, data: dict = None) -> Dict:
+    def get_and_update_or_create_item_if_not_found_by_name(self, item_name: str, data: dict = None, csrf_token: str = None) -> Dict:
         labels_data = {'labels': {
             'en': {'language': 'en', 'value': item_name}}}
         entity_data = labels_data if not data else {**labels_data, **data}
@@ -652,222 +1117,219 @@ class WbCursor(Loggable):
         entities = self.api.search_items({'label': item_name})
         if len(entities) >= 1:
             if data:
-                item_id = int(entities[0]['id'][1:])
+                item_id = entity_numeric_id(entities[0]['id'])
                 claims = self.api.get_item_claims(item_id)
                 self._merge_claims_with_unique_constraint(entity_data, claims)
                 entity = self.api.update_item(
-                    item_id, entity_data)
+                    item_id, entity_data, csrf_token)
                 return entity
             return entities[0]
 
         if len(entities) == 0:
-            entity = self.api.new_item(entity_data)
+            entity = self.api.new_item(entity_data, csrf_token)
             return entity
 
         raise WbDatabase.InternalError(
             f'The entity {item_name} has another one (i.e. not unique)')
 
+    def _bulk_upsert_items(self, items: List[Tuple[str, List]]) -> int:
+        '''Create or update the items (label, claims) concurrently, returns the number of the written rows
+
+        The rows with the same label are written one after another (the later row updates the item
+        created by the earlier one), the different labels are written in parallel. The failed label
+        is logged and its remaining rows are not written.
+        '''
+        if not items:
+            return 0
+        csrf_token = self.api.csrf_token()
+        items_by_label: Dict[str, List[List]] = {}
+        for label, claims in items:
+            items_by_label.setdefault(label, []).append(claims)
+
+        def upsert(label_and_claims: Tuple[str, List[List]]) -> int:
+            label, claims_list = label_and_claims
+            written_rows = 0
+            try:
+                for claims in claims_list:
+                    self.get_and_update_or_create_item_if_not_found_by_name(
+                        label, data={'claims': claims}, csrf_token=csrf_token)
+                    written_rows += 1
+            except WbDatabase.InternalError as e:
+                self.error(e)
+            return written_rows
+
+        if len(items_by_label) == 1:
+            return upsert(next(iter(items_by_label.items())))
+        with ThreadPoolExecutor(max_workers=min(WbCursor.BULK_UPSERT_WORKERS, len(items_by_label))) as executor:
+            return sum(executor.map(upsert, items_by_label.items()))
+
     def get_or_create_property_if_not_found_by_name(self, property_name: str, data_type_name: str) -> Dict:
-        # TODO: add claims if we'll create the new property
-        entities = self.api.search_properties({'label': property_name})
-        if len(entities) == 1:
-            return entities[0]
-        if len(entities) == 0:
-            entity = self.api.new_property(
-                {'labels': {'en': {'language': 'en', 'value': property_name}}, 'datatype': data_type_name})
+        # The models checked in parallel share the properties, so one name is resolved by one thread
+        # and remembered (the search doesn't see a just created property at once)
+        properties_by_name = self.wikibase_info.wikibase_properties_by_name
+        with self.wikibase_info.property_name_locks(property_name):
+            entity = properties_by_name.get(property_name)
+            if entity is not None:
+                return entity
+            # TODO: add claims if we'll create the new property
+            entities = self.api.search_properties({'label': property_name})
+            if len(entities) == 1:
+                entity = entities[0]
+            elif len(entities) == 0:
+                entity = self.api.new_property(
+                    {'labels': {'en': {'language': 'en', 'value': property_name}}, 'datatype': data_type_name})
+            else:
+                raise WbDatabase.InternalError(
+                    f'The property {property_name} has another one (i.e. not unique)')
+            properties_by_name[property_name] = entity
             return entity
-        raise WbDatabase.InternalError(
-            f'The property {property_name} has another one (i.e. not unique)')
 
     def _wb_link(self, snak: dict) -> DjangoProperty:
         return WbLink(
-            snak['mainsnak']['datavalue']['value']['numeric-id'],
+            _claim_numeric_id(snak),
             snak['mainsnak']['datavalue']['value']['entity-type'],
-            self.wikibase_info[WbDatabase._BASE_URL])
+            self._base_url)
 
     def _general_model_label(self, model: DjangoModel):
-        application = model['application']
-        return f'{application}{" for " + self.django_namespace if self.django_namespace else ""}'
+        return general_model_label(model['application'], self._ns_suffix)
 
     def _model_label(self, model: DjangoModel):
-        model_name = model['type'].split('.')[-1]
-        return f'{model_name} in {self._general_model_label(model)}'
+        return model_label(model['type'], model['application'], self._ns_suffix)
 
     def _instance_of_model_label(self, model: DjangoModel, pk: Any):
-        model_name = model['type'].split('.')[-1]
-        return f'{model_name}:{pk} in {self._general_model_label(model)}'
-
-    def _wikibase_property(self, wikibase_property_id: int) -> Dict:
-        cached_wikibase_property = self.wikibase_info[WbDatabase._WIKIBASE_PROPERTIES].get(
-            wikibase_property_id)
-        if cached_wikibase_property:
-            return cached_wikibase_property
-        for wikibase_property in self.api.get_entities(
-                [WbLink(wikibase_property_id, 'property', self.wikibase_info[WbDatabase._BASE_URL])]):
-            self.wikibase_info[WbDatabase._WIKIBASE_PROPERTIES][wikibase_property_id] = wikibase_property
-            return wikibase_property
-        raise WbDatabase.InternalError(
-            f'Sorry, I can\'t find wikibase_property  by id {wikibase_property_id}')
+        return instance_of_model_label(model['type'], model['application'], self._ns_suffix, pk)
+
+    def _prefetch_properties(self, wikibase_property_ids: Iterable[int]):
+        cached_wikibase_properties = self.wikibase_info.wikibase_properties
+        missed_wikibase_property_ids = {
+            wikibase_property_id for wikibase_property_id in wikibase_property_ids
+            if not cached_wikibase_properties.get(wikibase_property_id)}
+        if not missed_wikibase_property_ids:
+            return
+        for wikibase_property in self.api.get_entities_by_ids(
+                (('property', wikibase_property_id) for wikibase_property_id in missed_wikibase_property_ids),
+                _PROPERTY_PROPS, _PROPERTY_LANGUAGES):
+            if 'missing' in wikibase_property:
+                continue
+            cached_wikibase_properties[entity_numeric_id(wikibase_property['id'])] = wikibase_property
 
     def _claim_item_value(self, numeric_property_id: int, item: Dict = None, numeric_item_id: int = None) -> Dict:
         if item is None and numeric_item_id is None:
-            return {
-                'mainsnak': {
-                    'snaktype': 'novalue',
-                    'property': f'P{numeric_property_id}',
-                },
-                'type': 'statement',
-                'rank': 'normal'
-            }
+            return _statement(_novalue_snak(numeric_property_id))
 
-        return {
-            'mainsnak': {
-                'snaktype': 'value',
-                'property': f'P{numeric_property_id}',
-                'datavalue': {
-                            'value': {
-                                'entity-type': 'item',
-                                'numeric-id': int(item['id'][1:]) if item else numeric_item_id},
-                            'type': 'wikibase-entityid'}
-            },
-            'type': 'statement',
-            'rank': 'normal'
-        }
+        return _statement(_value_snak(numeric_property_id, 'wikibase-entityid', {
+            'entity-type': 'item',
+            'numeric-id': entity_numeric_id(item['id']) if item else numeric_item_id}))
 
     def _claim_string_value(self, numeric_property_id: int, value: str = None) -> Dict:
         if value is None or value == '':
-            return {
-                'mainsnak': {
-                    'snaktype': 'novalue',
-                    'property': f'P{numeric_property_id}',
-                },
-                'type': 'statement',
-                'rank': 'normal'
-            }
+            return _statement(_novalue_snak(numeric_property_id))
 
-        return {
-            'mainsnak': {
-                'snaktype': 'value',
-                'property': f'P{numeric_property_id}',
-                'datavalue': {
-                            'value': value,
-                            'type': 'string'}
-            },
-            'type': 'statement',
-            'rank': 'normal'
-        }
+        return _statement(_value_snak(numeric_property_id, 'string', value))
 
     def _claim_quantity_value(self, numeric_property_id: int, value: None) -> Dict:
         if value is None or value == '':
-            return {
-                'mainsnak': {
-                    'snaktype': 'novalue',
-                    'property': f'P{numeric_property_id}',
-                },
-                'type': 'statement',
-                'rank': 'normal'
-            }
+            return _statement(_novalue_snak(numeric_property_id))
 
-        return {
-            'mainsnak': {
-                'snaktype': 'value',
-                'property': f'P{numeric_property_id}',
-                'datavalue': {
-                            'value': {
-                                'amount': value,
-                                'unit': '1'
-                            },
-                    'type': 'quantity'}
-            },
-            'type': 'statement',
-            'rank': 'normal'
-        }
+        return _statement(_value_snak(numeric_property_id, 'quantity', {'amount': value, 'unit': '1'}))
 
     def _merge_claims_with_unique_constraint(self, entity_data: dict, claims: dict):
-        merged_claims = []
+        existed_claim_ids = {property_id: property_claims[0]['id']
+                             for property_id, property_claims in claims.items() if property_claims}
         for claim in entity_data['claims']:
-            property_id = int(claim['mainsnak']['property'][1:])
-            if f'P{property_id}' in claims:
-                claim['id'] = claims[f'P{property_id}'][0]['id']
-            merged_claims.append(claim)
-        entity_data['claims'] = merged_claims
-
-    def _check_or_create_model(self, model: DjangoModel):
+            existed_claim_id = existed_claim_ids.get(claim['mainsnak']['property'])
+            if existed_claim_id:
+                claim['id'] = existed_claim_id
+
+    def _item_claims(self, entity: Dict) -> Dict:
+        '''Claims confirmed by the last edit of the entity, requested only when the entity has no claims'''
+        if not 'claims' in entity:
+            return self.api.get_item_claims(entity_numeric_id(entity['id']))
+        # The entity without statements has an empty list instead of a dict
+        return entity['claims'] or {}
+
+    def _check_or_create_model(self, model: DjangoModel, parallel_properties: bool = True):
+        checked_models = self.wikibase_info.checked_models
+        model_key = (model['application'], model['type'], model['table_name'])
+        concrete_model = checked_models.get(model_key)
+        if concrete_model is not None:
+            return concrete_model
 
         # Check general model
         general_model_label = self._general_model_label(model)
-        if not(general_model_label in self.wikibase_info):
+        if not(general_model_label in self.wikibase_info.models_by_label):
             # get application django model it contains general info
             application_model = self.get_and_update_or_create_item_if_not_found_by_name(
                 general_model_label,
                 data={'claims': [
                     self._claim_item_value(
-                        self.wikibase_info[WbDatabase._SUBCLASS_OF]['id'],
-                        numeric_item_id=self.wikibase_info[WbDatabase._DJANGO_MODEL]['id']),
+                        self._subclass_of_property_id,
+                        numeric_item_id=self._django_model_item_id),
                     # self._claim_value(
-                    #     self.wikibase_info[WbDatabase._DJANGO_SEQUENCE]['id'],
+                    #     self.wikibase_info.django_sequence['id'],
                     #     numeric_item_id=...),
                     self._claim_string_value(
-                        self.wikibase_info[WbDatabase._DJANGO_APPLICATION]['id'],
+                        self._django_application_property_id,
                         model['application']),
                     self._claim_string_value(
-                        self.wikibase_info[WbDatabase._DJANGO_NAMESPACE]['id'],
+                        self._django_namespace_property_id,
                         self.django_namespace),
                 ]})
 
-            application_model_claims = self.api.get_item_claims(
-                int(application_model['id'][1:]))
+            application_model_claims = self._item_claims(application_model)
 
-            django_sequence_property_id = self.wikibase_info[WbDatabase._DJANGO_SEQUENCE]['id']
-            if not (f'P{django_sequence_property_id}' in application_model_claims):
-                application_model_claims[f'P{django_sequence_property_id}'] = [
-                ]
+            if not (self._django_sequence_p in application_model_claims):
+                application_model_claims[self._django_sequence_p] = []
             # application_model_sequences = [self._wb_link(property_value) for property_value in application_model_claims[f'P{django_sequence_property_id}']] \
             #    if f'P{django_sequence_property_id}' in application_model_claims else []
 
             application_model['claims'] = application_model_claims
-            self.wikibase_info[general_model_label] = application_model
+            self.wikibase_info.models_by_label[general_model_label] = application_model
 
         # Check concrete model
         concrete_model_label = self._model_label(model)
-        if not(concrete_model_label in self.wikibase_info):
+        if not(concrete_model_label in self.wikibase_info.models_by_label):
 
             concrete_model = self.get_and_update_or_create_item_if_not_found_by_name(
                 concrete_model_label,
                 data={'claims': [
                     self._claim_item_value(
-                        self.wikibase_info[WbDatabase._SUBCLASS_OF]['id'],
-                        self.wikibase_info[general_model_label]),
+                        self._subclass_of_property_id,
+                        self.wikibase_info.models_by_label[general_model_label]),
                     # self._claim_value(
-                    #     self.wikibase_info[WbDatabase._DJANGO_SEQUENCE]['id'],
+                    #     self.wikibase_info.django_sequence['id'],
                     #     numeric_item_id=...),
                     self._claim_string_value(
-                        self.wikibase_info[WbDatabase._PYTHON_TYPE]['id'],
+                        self._python_type_property_id,
                         model['type']),
                     self._claim_string_value(
-                        self.wikibase_info[WbDatabase._SQL_TABLE]['id'],
+                        self._sql_table_property_id,
                         model['table_name']),
                     self._claim_string_value(
-                        self.wikibase_info[WbDatabase._DJANGO_APPLICATION]['id'],
+                        self._django_application_property_id,
                         model['application']),
                     self._claim_string_value(
-                        self.wikibase_info[WbDatabase._DJANGO_NAMESPACE]['id'],
+                        self._django_namespace_property_id,
                         self.django_namespace),
                 ]})
-            concrete_model_id = int(concrete_model['id'][1:])
-
-            django_field_property_id = self.wikibase_info[WbDatabase._DJANGO_FIELD]['id']
-            # below is the request existed claims or add a placeholder for them
-            concrete_model_claims = self.api.get_item_claims(concrete_model_id)
-            if not (f'P{django_field_property_id}' in concrete_model_claims):
-                concrete_model_claims[f'P{django_field_property_id}'] = []
-            concrete_model_properties = [self._wb_link(property_value) for property_value in concrete_model_claims[f'P{django_field_property_id}']] \
-                if f'P{django_field_property_id}' in concrete_model_claims else []
-
+            concrete_model_id = concrete_model['_numeric_id'] = entity_numeric_id(concrete_model['id'])
+
+            django_field_property_id = self._django_field_property_id
+            # below is the existed claims or add a placeholder for them
+            concrete_model_claims = self._item_claims(concrete_model)
+            if not (self._django_field_p in concrete_model_claims):
+                concrete_model_claims[self._django_field_p] = []
+            concrete_model_property_ids = list(
+                map(_claim_numeric_id, concrete_model_claims[self._django_field_p]))
+            # Only the properties missed in the cache are requested
+            self._prefetch_properties(concrete_model_property_ids)
+            cached_wikibase_properties = self.wikibase_info.wikibase_properties
             concrete_model_fields = {
-                p['labels']['en']['value'] for p in self.api.get_entities(concrete_model_properties)}
+                self._wikibase_entity_name(cached_wikibase_properties[wikibase_property_id])
+                for wikibase_property_id in concrete_model_property_ids if wikibase_property_id in cached_wikibase_properties}
 
             # Create/Update properties
+            missed_properties = {}
             for field in model['fields']:
                 related_model_label = self._model_label(
                     field['related_models'][0]) if field['related_models'] else None
@@ -877,216 +1339,276 @@ class WbCursor(Loggable):
 
                 if property_name in concrete_model_fields:
                     continue
-
-                # Create claim cause missed
-                wikibase_property = self.get_or_create_property_if_not_found_by_name(
-                    property_name, WbDatabase.get_property_type_for_django_field(field))
-                wikibase_property_id = int(wikibase_property['id'][1:])
-                self.wikibase_info[WbDatabase._WIKIBASE_PROPERTIES][wikibase_property_id] = wikibase_property
-
-                claim = self.api.new_claim('item', concrete_model_id, django_field_property_id, {
-                                           'entity-type': 'property', 'numeric-id': wikibase_property_id})
-                concrete_model_claims[f'P{django_field_property_id}'].append(
-                    claim)
+                missed_properties[property_name] = WbDatabase.get_property_type_for_django_field(
+                    field)
+
+            new_claims = []
+            if missed_properties:
+                # The properties are independent, so they are found (or created) in parallel
+                # unless the model itself is checked by a worker of check_models
+                def get_or_create_property(property_name_and_type: Tuple[str, str]) -> Dict:
+                    return self.get_or_create_property_if_not_found_by_name(*property_name_and_type)
+
+                if parallel_properties and len(missed_properties) > 1:
+                    with ThreadPoolExecutor(max_workers=min(WbCursor.MODEL_PROPERTY_WORKERS, len(missed_properties))) as executor:
+                        wikibase_properties = list(executor.map(
+                            get_or_create_property, missed_properties.items()))
+                else:
+                    wikibase_properties = list(
+                        map(get_or_create_property, missed_properties.items()))
+                for wikibase_property in wikibase_properties:
+                    wikibase_property_id = entity_numeric_id(wikibase_property['id'])
+                    self.wikibase_info.wikibase_properties[wikibase_property_id] = wikibase_property
+                    new_claims.append(_statement(_value_snak(django_field_property_id, 'wikibase-entityid', {
+                        'entity-type': 'property', 'numeric-id': wikibase_property_id})))
 
             # default sequence for the concrete model
-            django_next_id_property_id = self.wikibase_info[WbDatabase._DJANGO_NEXT_ID]['id']
-            if not (f'P{django_next_id_property_id}' in concrete_model_claims):
-                claim = self.api.new_claim('item', concrete_model_id, django_next_id_property_id, {
-                                           'amount': 1, 'unit': '1'})
-                concrete_model_claims[f'P{django_next_id_property_id}'] = [
-                    claim]
+            if not (self._django_next_id_p in concrete_model_claims):
+                new_claims.append(self._claim_quantity_value(
+                    self._django_next_id_property_id, 1))
+
+            if new_claims:
+                # All missed claims are added with the single edit of the model item
+                edited_claims = self.api.update_item(
+                    concrete_model_id, {'claims': new_claims}).get('claims') or {}
+                for property_id in (self._django_field_p, self._django_next_id_p):
+                    if property_id in edited_claims:
+                        concrete_model_claims[property_id] = edited_claims[property_id]
 
             concrete_model['claims'] = concrete_model_claims
-            self.wikibase_info[concrete_model_label] = concrete_model
+            self._index_model_fields(model, concrete_model)
+            self.wikibase_info.models_by_label[concrete_model_label] = concrete_model
             # Store table link
-            self.wikibase_info[WbDatabase._DJANGO_MODELS][model['table_name']] = model
+            self.wikibase_info.django_models[model['table_name']] = model
 
+            checked_models[model_key] = concrete_model
             return concrete_model
 
-        return self.wikibase_info[concrete_model_label]
+        concrete_model = checked_models[model_key] = self.wikibase_info.models_by_label[concrete_model_label]
+        return concrete_model
 
-    def _django_field_name_from_wikibase_property_name(self, wikibase_property_name: str) -> str:
-        result = wikibase_property_name.strip()
-        if 'ForeignKey' in wikibase_property_name:
-            # DjangoProperty._property_name
-            return f'{result[:result.index(" ")]}_id'
-        return result[:result.index(' ')]
+    def _forget_model(self, table_name: str):
+        '''Drops the memoized model items of the table, the next check requests them again'''
+        checked_models = self.wikibase_info.checked_models
+        forgotten_models = [checked_models.pop(model_key) for model_key in list(checked_models)
+                            if model_key[2] == table_name]
+        if forgotten_models:
+            models_by_label = self.wikibase_info.models_by_label
+            for label in [label for label, concrete_model in models_by_label.items()
+                          if any(concrete_model is model for model in forgotten_models)]:
+                del models_by_label[label]
+        self.connection._instance_of_expressions.pop(table_name, None)
 
-    def _wikibase_entity_name(self, wikibase_entity: dict) -> str:
-        return wikibase_entity[
-            'label'] if 'label' in wikibase_entity else wikibase_entity['labels']['en']['value']
+    _django_field_name_from_wikibase_property_name = staticmethod(
+        django_field_name_from_wikibase_property_name)
 
-    def _convert_to_snak_and_handle_value(self, wikibase_property_id, wikibase_datatype: str, django_field_value: Any) -> Dict:
-        # Snak template
+    _wikibase_entity_name = staticmethod(wikibase_entity_name)
+
+    def _convert_to_snak_and_handle_value(self, wikibase_property_id, wikibase_datatype: str, django_field_value: Any,
+                                          resolved_foreign_items: Dict[str, int] = None) -> Dict:
         if django_field_value is None or \
                 str(django_field_value).strip() == '':
-            return {
-                'snaktype': 'novalue',
-                'property': f'P{wikibase_property_id}'
-            }
-        result = {
-            'snaktype': 'value',
-            'property': f'P{wikibase_property_id}',
-            'datavalue': {
-                'value': None,
-                'type': self._replace_unsupported_types(wikibase_datatype)}
-        }
-
-        # Handle value
-        if wikibase_datatype == 'string':
-            if isinstance(django_field_value, FieldFile):  # FileField
-                field_value: FieldFile = django_field_value
-                # Upload file to the mediawiki storage
-                try:
-                    self.api.upload_file(field_value.name, field_value.file,
-                                         self.wikibase_info[WbDatabase._WIKIBASE_CREDENTIALS])
-                except FileNotFoundError as e:
-                    self.error(e)
-            if isinstance(django_field_value, ImageFieldFile):  # ImageField
-                field_value: ImageFieldFile = django_field_value
-                # Upload file to the mediawiki storage
-                try:
-                    self.api.upload_file(field_value.name, field_value.file,
-                                         self.wikibase_info[WbDatabase._WIKIBASE_CREDENTIALS])
-                except FileNotFoundError as e:
-                    self.error(e)
-            result['datavalue']['value'] = str(django_field_value)
-        elif wikibase_datatype == 'commonsMedia':
-            # TODO: upload to the https://commons.wikipedia.org
-            result['datavalue']['value'] = django_field_value.name
-        elif wikibase_datatype == 'quantity':
-            result['datavalue']['value'] = {
-                'amount': float(django_field_value),
-                'unit': '1'
-            }
-        elif wikibase_datatype == 'wikibase-item':
-            foreign_property_name = self._wikibase_entity_name(
-                self._wikibase_property(wikibase_property_id))
-            django_foreign_key_value = int(django_field_value)
-            splitter_position = foreign_property_name.find('ForeignKey to')
+            return _novalue_snak(wikibase_property_id)
+        snak_handler = _SNAK_HANDLERS.get(wikibase_datatype)
+        if snak_handler is None:
+            raise WbDatabase.InternalError(
+                f'Sorry, I can\'t convert django_field_value {django_field_value} to wikibase_datatype {wikibase_datatype}')
+        return snak_handler(self, wikibase_property_id,
+                            _DATATYPE_WIRE.get(wikibase_datatype, wikibase_datatype), django_field_value,
+                            resolved_foreign_items)
+
+    def _snak_string(self, wikibase_property_id: int, datavalue_type: str, django_field_value: Any,
+                     resolved_foreign_items: Dict[str, int] = None) -> Dict:
+        if isinstance(django_field_value, FieldFile):  # FileField, ImageField
+            # Upload file to the mediawiki storage
+            try:
+                self.api.upload_file(django_field_value.name, django_field_value.file,
+                                     self.wikibase_info.wikibase_credentials)
+            except FileNotFoundError as e:
+                self.error(e)
+        return _value_snak(wikibase_property_id, datavalue_type, str(django_field_value))
+
+    def _snak_commons_media(self, wikibase_property_id: int, datavalue_type: str, django_field_value: Any,
+                            resolved_foreign_items: Dict[str, int] = None) -> Dict:
+        # TODO: upload to the https://commons.wikipedia.org
+        return _value_snak(wikibase_property_id, datavalue_type, django_field_value.name)
+
+    def _snak_quantity(self, wikibase_property_id: int, datavalue_type: str, django_field_value: Any,
+                       resolved_foreign_items: Dict[str, int] = None) -> Dict:
+        return _value_snak(wikibase_property_id, datavalue_type, {
+            'amount': float(django_field_value),
+            'unit': '1'
+        })
 
-            wikibase_item_id = None
-            if splitter_position > -1:
-                foreign_item_name = foreign_property_name[splitter_position + len(
-                    'ForeignKey to') + 1:].replace(' in ', f':{django_foreign_key_value} in ')
+    def _snak_wikibase_item(self, wikibase_property_id: int, datavalue_type: str, django_field_value: Any,
+                            resolved_foreign_items: Dict[str, int] = None) -> Dict:
+        foreign_item_name = self._foreign_item_name(
+            wikibase_property_id, django_field_value)
 
+        wikibase_item_id = None
+        if foreign_item_name is not None:
+            if resolved_foreign_items is not None:
+                wikibase_item_id = resolved_foreign_items.get(
+                    foreign_item_name)
+            else:
                 foreign_entities = self.api.search_items(
                     {'label': foreign_item_name})
 
                 if len(foreign_entities) == 1:
-                    wikibase_item_id = int(foreign_entities[0]['id'][1:])
+                    wikibase_item_id = entity_numeric_id(foreign_entities[0]['id'])
 
-            if wikibase_item_id:
-                result['datavalue']['value'] = {
-                    'numeric-id': wikibase_item_id,
-                    'entity-type': 'item'
-                }
-            else:
-                result['snaktype'] = 'novalue'
-
-        elif wikibase_datatype == 'time':
-            result['datavalue']['value'] = {
-                'time': '+' + django_field_value.replace(tzinfo=None, hour=0, minute=0, second=0).isoformat('T', 'seconds') + 'Z',
-                'timezone': 0,
-                'before': 0,
-                'after': 0,
-                'precision': 11,
-                'calendarmodel': 'http://www.wikidata.org/entity/Q1985727'
-            }
-        else:
-            raise WbDatabase.InternalError(
-                f'Sorry, I can\'t convert django_field_value {django_field_value} to wikibase_datatype {wikibase_datatype}')
+        if not wikibase_item_id:
+            return _novalue_snak(wikibase_property_id)
+        return _value_snak(wikibase_property_id, datavalue_type, {
+            'numeric-id': wikibase_item_id,
+            'entity-type': 'item'
+        })
 
-        return result
+    def _foreign_item_name(self, wikibase_property_id: int, django_field_value: Any) -> Optional[str]:
+        foreign_property_name = self._wikibase_entity_name(
+            self._wikibase_property(wikibase_property_id))
+        splitter_position = foreign_property_name.find('ForeignKey to')
+        if splitter_position < 0:
+            return None
+        return foreign_property_name[splitter_position + len(
+            'ForeignKey to') + 1:].replace(' in ', f':{int(django_field_value)} in ')
 
-    def _replace_unsupported_types(self, wikibase_type: str) -> str:
-        if wikibase_type == 'commonsMedia':
-            return 'string'
-        if wikibase_type == 'wikibase-item':
-            return 'wikibase-entityid'
-        return wikibase_type
+    def _foreign_item_names(self, field_properties: List[Tuple[int, str, str]], values: List[Dict]) -> Set[str]:
+        foreign_item_names = set()
+        for wikibase_property_id, django_field_name, datatype in field_properties:
+            if datatype != 'wikibase-item':
+                continue
+            for value in values:
+                django_field_value = value.get(django_field_name)
+                if django_field_value is None or str(django_field_value).strip() == '':
+                    continue
+                foreign_item_name = self._foreign_item_name(
+                    wikibase_property_id, django_field_value)
+                if foreign_item_name is not None:
+                    foreign_item_names.add(foreign_item_name)
+        return foreign_item_names
+
+    def _resolve_foreign_items(self, foreign_item_names: Set[str]) -> Dict[str, int]:
+        if not foreign_item_names:
+            return {}
+        found_item_ids = self.api.try_search_entities_bulk(foreign_item_names, 'item')
+
+        resolved_foreign_items = {}
+        for foreign_item_name in foreign_item_names:
+            item_ids = found_item_ids.get(foreign_item_name)
+            if item_ids:
+                if len(item_ids) == 1:
+                    resolved_foreign_items[foreign_item_name] = entity_numeric_id(item_ids[0])
+                continue
+            # The query service can lag behind the recent edits
+            foreign_entities = self.api.search_items(
+                {'label': foreign_item_name})
+            if len(foreign_entities) == 1:
+                resolved_foreign_items[foreign_item_name] = entity_numeric_id(foreign_entities[0]['id'])
+        return resolved_foreign_items
+
+    def _snak_time(self, wikibase_property_id: int, datavalue_type: str, django_field_value: Any,
+                   resolved_foreign_items: Dict[str, int] = None) -> Dict:
+        return _value_snak(wikibase_property_id, datavalue_type, {
+            'time': '+' + django_field_value.replace(tzinfo=None, hour=0, minute=0, second=0).isoformat('T', 'seconds') + 'Z',
+            'timezone': 0,
+            'before': 0,
+            'after': 0,
+            'precision': 11,
+            'calendarmodel': 'http://www.wikidata.org/entity/Q1985727'
+        })
 
-    def _claims_make(self, claims: List, value: Dict) -> List:
+    def _claims_make(self, field_properties: List[Tuple[int, str, str]], value: Dict, resolved_foreign_items: Dict[str, int] = None) -> List:
+        convert = self._convert_to_snak_and_handle_value
+        if self._emit_novalue_snaks:
+            return [_statement(convert(wikibase_property_id, datatype, value[django_field_name], resolved_foreign_items))
+                    for wikibase_property_id, django_field_name, datatype in field_properties
+                    if django_field_name in value]
         result = []
-        for claim in claims:
-            wikibase_property_id = claim['mainsnak']['datavalue']['value']['numeric-id']
-            wikibase_property = self._wikibase_property(wikibase_property_id)
-            django_field_name = self._django_field_name_from_wikibase_property_name(
-                self._wikibase_entity_name(wikibase_property))
-            if django_field_name in value:
-                result.append({
-                    'mainsnak': self._convert_to_snak_and_handle_value(wikibase_property_id, wikibase_property['datatype'], value[django_field_name]),
-                    'type': 'statement',
-                    'rank': 'normal'
-                })
+        for wikibase_property_id, django_field_name, datatype in field_properties:
+            django_field_value = value.get(django_field_name)
+            if django_field_value is None or django_field_value == '':
+                continue
+            result.append(_statement(convert(
+                wikibase_property_id, datatype, django_field_value, resolved_foreign_items)))
         return result
 
+    def _index_model_fields(self, model: DjangoModel, concrete_model: Dict):
+        claim_ids = list(
+            map(_claim_numeric_id, concrete_model['claims'][self._django_field_p]))
+        self._prefetch_properties(claim_ids)
+        wikibase_property = self._wikibase_property
+        # (numeric property id, django field name, datatype) per field claim, in claim order
+        field_properties = []
+        wikibase_property_ids = {}
+        for wikibase_property_id in claim_ids:
+            entity = wikibase_property(wikibase_property_id)
+            django_field_name = django_field_name_from_wikibase_property_name(
+                wikibase_entity_name(entity))
+            field_properties.append(
+                (wikibase_property_id, django_field_name, entity['datatype']))
+            wikibase_property_ids.setdefault(
+                django_field_name, wikibase_property_id)
+        concrete_model['_field_properties'] = field_properties
+
+        field_index = {field['attribute_name']: wikibase_property_ids[field['attribute_name']]
+                       for field in model['fields'] if field['attribute_name'] in wikibase_property_ids}
+        concrete_model['_field_index'] = field_index
+        concrete_model['_autofield'] = next(
+            ((field_index[field['attribute_name']], field['attribute_name']) for field in model['fields']
+             if field['property_type'] in {'AutoField', 'BigAutoField'} and field['attribute_name'] in field_index),
+            (None, None))
+        concrete_model['_pk'] = next(
+            ((field_index[field['attribute_name']], field['attribute_name']) for field in model['fields']
+             if field['attribute_name'] == model['pk'] and field['attribute_name'] in field_index),
+            (None, None))
+
     def _get_autofield_numeric_property_id_and_django_autofield_name_or_none(self, model: DjangoModel, concrete_model: Dict) -> int:
-        django_field_property_id = self.wikibase_info[WbDatabase._DJANGO_FIELD]['id']
-        for field in model['fields']:
-            if field['property_type'] in {'AutoField', 'BigAutoField'}:
-                for claim in concrete_model['claims'][f'P{django_field_property_id}']:
-                    wikibase_property_id = claim['mainsnak']['datavalue']['value']['numeric-id']
-                    wikibase_property = self._wikibase_property(
-                        wikibase_property_id)
-                    django_field_name = self._django_field_name_from_wikibase_property_name(
-                        self._wikibase_entity_name(wikibase_property))
-                    if django_field_name == field['attribute_name']:
-                        return wikibase_property_id, django_field_name
-        return None, None
+        return concrete_model['_autofield']
 
     def _get_primary_key_numeric_property_id_and_django_primary_key_name_or_none(self, model: DjangoModel, concrete_model: Dict) -> int:
-        django_field_property_id = self.wikibase_info[WbDatabase._DJANGO_FIELD]['id']
-        for field in model['fields']:
-            if field['attribute_name'] == model['pk']:
-                for claim in concrete_model['claims'][f'P{django_field_property_id}']:
-                    wikibase_property_id = claim['mainsnak']['datavalue']['value']['numeric-id']
-                    wikibase_property = self._wikibase_property(
-                        wikibase_property_id)
-                    django_field_name = self._django_field_name_from_wikibase_property_name(
-                        self._wikibase_entity_name(wikibase_property))
-                    if django_field_name == field['attribute_name']:
-                        return wikibase_property_id, django_field_name
-        return None, None
+        return concrete_model['_pk']
 
     def _get_wikibase_numeric_property_id_or_none(self, model: DjangoModel, property_name: str) -> int:
-        concrete_model = self._check_or_create_model(model)
-        django_field_property_id = self.wikibase_info[WbDatabase._DJANGO_FIELD]['id']
-        for field in model['fields']:
-            if field['attribute_name'] == property_name:
-                for claim in concrete_model['claims'][f'P{django_field_property_id}']:
-                    wikibase_property_id = claim['mainsnak']['datavalue']['value']['numeric-id']
-                    wikibase_property = self._wikibase_property(
-                        wikibase_property_id)
-                    django_field_name = self._django_field_name_from_wikibase_property_name(
-                        self._wikibase_entity_name(wikibase_property))
-                    if django_field_name == field['attribute_name']:
-                        return wikibase_property_id
-        return None
-
-    def _convert_values(self, values_map: dict, keys: list) -> Tuple:
-        return tuple([values_map[key]['value'] for key in keys])
-
-    def _tuples(self, vars: list, bindings: list) -> List[Tuple]:
-        return [self._convert_values(t, vars) for t in bindings]
+        return self._check_or_create_model(model)['_field_index'].get(property_name)
+
+    def _tuples_iter(self, vars: list, bindings: list) -> Iterator[Tuple]:
+        if not vars:
+            return (() for _ in bindings)
+        converters = _binding_converters(
+            vars, bindings[0]) if bindings else [_binding_value] * len(vars)
+        if len(vars) == 1:
+            var = vars[0]
+            convert = converters[0]
+            if convert is _binding_value:
+                return ((t[var]['value'],) for t in bindings)
+            return ((convert(t[var]),) for t in bindings)
+        binding_values = itemgetter(*vars)
+        if _binding_integer not in converters:
+            return (tuple(map(_binding_value, binding_values(t))) for t in bindings)
+        return (tuple(map(_apply, converters, binding_values(t))) for t in bindings)
 
     def _add_property(self, cmd: Cmd, params: list):
-        self.debug('_add_property %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_add_property %s with %s', cmd, params)
         for model in (cmd['data']['model'], ) if not cmd['data']['property']['related_models'] else (cmd['data']['model'], cmd['data']['property']['related_models'][0]):
             self._check_or_create_model(model)
 
     def _alter_property(self, cmd: Cmd, params: list):
-        self.debug('_alter_property %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_alter_property %s with %s', cmd, params)
 
     def _add_constraints(self, cmd: Cmd, params: list):
-        self.debug('_add_constraints %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_add_constraints %s with %s', cmd, params)
 
     def _field_indexes(self, cmd: Cmd, params: list):
-        self.debug('_field_indexes %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_field_indexes %s with %s', cmd, params)
 
     def _create_foreignkey_constraint(self, cmd: Cmd, params: list):
-        self.debug('_create_foreignkey_constraint %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_create_foreignkey_constraint %s with %s', cmd, params)
 
     # def _lookup_field_by_name(self, field_name: str) -> Optional[Field]:
     #     for k, v in apps.all_models.items():
@@ -1106,47 +1628,46 @@ class WbCursor(Loggable):
     #     entity_name = self._wikibase_entity_name(entity)
     #     claims = entity['claims']
     #     # Recollect DjangoModel from claims
-    #     python_type_property_id = self.wikibase_info[WbDatabase._PYTHON_TYPE]['id']
-    #     sql_table_property_id = self.wikibase_info[WbDatabase._SQL_TABLE]['id']
+    #     python_type_property_id = self.wikibase_info.python_type['id']
+    #     sql_table_property_id = self.wikibase_info.sql_table['id']
     #     python_type = claims[f'P{python_type_property_id}'][0]['mainsnak']['datavalue']['value']
     #     sql_table = claims[f'P{sql_table_property_id}'][0]['mainsnak']['datavalue']['value']
-    #     django_field_property_id = self.wikibase_info[WbDatabase._DJANGO_FIELD]['id']
+    #     django_field_property_id = self.wikibase_info.django_field['id']
     #     django_properties = []
     #     for claim in claims[f'P{django_field_property_id}']:
     #         field = self._lookup_field_by_name('')
     #         django_properties.append(DjangoProperty(field))
 
     def _show_all_models(self, cmd: Cmd, params: list):
-        self.debug('_show_all_models %s with %s', cmd, params)
-        sparql = self.prefixes[:]
-        sparql.append('''
+        if self._debug_enabled:
+            self.debug('_show_all_models %s with %s', cmd, params)
+        sparql = f'''
         SELECT
         ?sql_table ?type ?model ?model_name ?python_type ?namespace ?application
-        WHERE {''')
-        sparql.append(f'''
-           ?model pd:P{self.wikibase_info[WbDatabase._SUBCLASS_OF]['id']} ?models
+        WHERE {{
+           ?model pd:P{self._subclass_of_property_id} ?models
            . ?model rdfs:label ?name
-           . ?models pd:P{self.wikibase_info[WbDatabase._SUBCLASS_OF]['id']} e:Q{self.wikibase_info[WbDatabase._DJANGO_MODEL]['id']}
-           . ?model pd:P{self.wikibase_info[WbDatabase._PYTHON_TYPE]['id']} ?python_type
-           . ?model pd:P{self.wikibase_info[WbDatabase._SQL_TABLE]['id']} ?sql_table
-           . ?models pd:P{self.wikibase_info[WbDatabase._DJANGO_NAMESPACE]['id']} ?namespace
-           . ?models pd:P{self.wikibase_info[WbDatabase._DJANGO_APPLICATION]['id']} ?application
+           . ?models pd:P{self._subclass_of_property_id} e:Q{self._django_model_item_id}
+           . ?model pd:P{self._python_type_property_id} ?python_type
+           . ?model pd:P{self._sql_table_property_id} ?sql_table
+           . ?models pd:P{self._django_namespace_property_id} ?namespace
+           . ?models pd:P{self._django_application_property_id} ?application
            . BIND(STRBEFORE(?name, ' ') AS ?model_name)
            . BIND('t' AS ?type)
-        ''')
-        sparql.append('''
-        }
-        ''')
+        }}
+        '''
 
         answer = self.api.execute_sparql_query(
-            '\n'.join(sparql)
+            self._prefix_block + '\n' + sparql
         )
-        self.result = self._tuples(
+        self._rows = self._tuples_iter(
             answer['head']['vars'], answer['results']['bindings'])
         self._position = 0
 
     def _remove_property(self, cmd: Cmd, params: list):
-        self.debug('_remove_property %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_remove_property %s with %s', cmd, params)
+        self.connection.invalidate_cache()
 
     def _savepoint_create(self, cmd: Cmd, params: list):
         # self.debug('_savepoint_create %s with %s', cmd, params)
@@ -1161,33 +1682,43 @@ class WbCursor(Loggable):
         ...
 
     def _add_items(self, cmd: Cmd, values: list):
+        written_rows = 0
         try:
-            self.debug('_add_items %s with %s', cmd, values)
+            if self._debug_enabled:
+                self.debug('_add_items %s with %s', cmd, values)
             model = cmd['data']['model']
             concrete_model = self._check_or_create_model(model)
 
-            instance_of_property_id = self.wikibase_info[WbDatabase._INSTANCE_OF]['id']
-            django_field_property_id = self.wikibase_info[WbDatabase._DJANGO_FIELD]['id']
-            django_next_id_property_id = self.wikibase_info[WbDatabase._DJANGO_NEXT_ID]['id']
+            instance_of_property_id = self._instance_of_property_id
+            field_properties = concrete_model['_field_properties']
+            resolved_foreign_items = self._resolve_foreign_items(
+                self._foreign_item_names(field_properties, values))
 
-            for value in values:
-                next_id = self.api.get_and_increase_value(
-                    concrete_model['claims'][f'P{django_next_id_property_id}'][0]['id'], 1)
+            # Reserve the whole id range with one sequence update
+            first_id = self.api.get_and_increase_value(
+                concrete_model['claims'][self._django_next_id_p][0]['id'], len(values)) if values else 0
+
+            autofield_property_id, _ = self._get_autofield_numeric_property_id_and_django_autofield_name_or_none(
+                model, concrete_model)
+            primary_key_property_id, _ = self._get_primary_key_numeric_property_id_and_django_primary_key_name_or_none(
+                model, concrete_model)
+            claims_make = self._claims_make
+            instance_of_claim = self._claim_item_value
+
+            items = []
+            for index, value in enumerate(values):
+                next_id = first_id + index
 
                 instance_of_model_label = self._instance_of_model_label(
                     model, next_id)
-                claims = self._claims_make(
-                    concrete_model['claims'][f'P{django_field_property_id}'], value)
-                claims.append(self._claim_item_value(
+                claims = claims_make(
+                    field_properties, value, resolved_foreign_items)
+                claims.append(instance_of_claim(
                     instance_of_property_id, concrete_model))
-                autofield_property_id, _ = self._get_autofield_numeric_property_id_and_django_autofield_name_or_none(
-                    model, concrete_model)
                 if autofield_property_id:
                     claims.append(self._claim_quantity_value(
                         autofield_property_id, next_id))
                 else:
-                    primary_key_property_id, _ = self._get_primary_key_numeric_property_id_and_django_primary_key_name_or_none(
-                        model, concrete_model)
                     if primary_key_property_id:
                         instance_of_model_label = self._instance_of_model_label(
                             model, value[model.pk])
@@ -1196,25 +1727,27 @@ class WbCursor(Loggable):
                         instance_of_model_label = self._instance_of_model_label(
                             model, '-')
 
-                self.get_and_update_or_create_item_if_not_found_by_name(
-                    instance_of_model_label,
-                    data={'claims': claims})
+                items.append((instance_of_model_label, claims))
+
+            written_rows = self._bulk_upsert_items(items)
 
         except WbDatabase.InternalError as e:
             # TODO: remove exception wrap after fix all errors
             self.error(e)
 
-        self.result = [[len(values)]]
-        self.rowcount = len(values)
+        self.connection.invalidate_cache()
+        # Only the written rows are reported
+        self.result = [[written_rows]]
+        self.rowcount = written_rows
 
     def _last_insert_id(self, cmd: Cmd, params: list):
-        self.debug('_last_insert_id %s with %s', cmd, params)
-        model = self.wikibase_info[WbDatabase._DJANGO_MODELS][cmd['data']['table']]
+        if self._debug_enabled:
+            self.debug('_last_insert_id %s with %s', cmd, params)
+        model = self.wikibase_info.django_models[cmd['data']['table']]
         concrete_model = self._check_or_create_model(model)
 
-        django_next_id_property_id = self.wikibase_info[WbDatabase._DJANGO_NEXT_ID]['id']
         claim_value = self.api.get_claim_value(
-            concrete_model['claims'][f'P{django_next_id_property_id}'][0]['id'])
+            concrete_model['claims'][self._django_next_id_p][0]['id'])
         self.result = [[int(claim_value['amount']) - 1]]
         self._position = 0
         self.rowcount = 0
@@ -1226,14 +1759,17 @@ class WbCursor(Loggable):
         return values
 
     def _set_items(self, cmd: Cmd, values: list):
+        written_rows = 0
         try:
-            self.debug('_set_items %s with %s', cmd, values)
+            if self._debug_enabled:
+                self.debug('_set_items %s with %s', cmd, values)
             model = cmd['data']['model']
             concrete_model = self._check_or_create_model(model)
 
-            instance_of_property_id = self.wikibase_info[WbDatabase._INSTANCE_OF]['id']
-            django_field_property_id = self.wikibase_info[WbDatabase._DJANGO_FIELD]['id']
-            django_next_id_property_id = self.wikibase_info[WbDatabase._DJANGO_NEXT_ID]['id']
+            instance_of_property_id = self._instance_of_property_id
+            field_properties = concrete_model['_field_properties']
+            resolved_foreign_items = self._resolve_foreign_items(
+                self._foreign_item_names(field_properties, values))
 
             autofield_property_id, django_autofield_name = self._get_autofield_numeric_property_id_and_django_autofield_name_or_none(
                 model, concrete_model)
@@ -1247,13 +1783,14 @@ class WbCursor(Loggable):
                 raise WbDatabase.InternalError(
                     'Sorry, I can\'t find autofield neither primary key property')
 
+            items = []
             for value in values:
                 if not(django_autofield_name in value) and not(django_primary_key_name in value):
                     raise WbDatabase.InternalError(
                         f'Sorry, I can\'t find autofield neither primary key property in the value {value}')
 
                 claims = self._claims_make(
-                    concrete_model['claims'][f'P{django_field_property_id}'], value)
+                    field_properties, value, resolved_foreign_items)
                 claims.append(self._claim_item_value(
                     instance_of_property_id, concrete_model))
 
@@ -1262,7 +1799,7 @@ class WbCursor(Loggable):
                     del value[django_autofield_name]
 
                     self.api.set_integer_value_if_less_then_current_value(
-                        concrete_model['claims'][f'P{django_next_id_property_id}'][0]['id'],
+                        concrete_model['claims'][self._django_next_id_p][0]['id'],
                         determined_id + 1)
 
                     instance_of_model_label = self._instance_of_model_label(
@@ -1280,74 +1817,94 @@ class WbCursor(Loggable):
                     claims.append(self._claim_string_value(
                         primary_key_property_id, pk))
 
-                self.get_and_update_or_create_item_if_not_found_by_name(
-                    instance_of_model_label,
-                    data={'claims': claims})
+                items.append((instance_of_model_label, claims))
+
+            written_rows = self._bulk_upsert_items(items)
 
         except WbDatabase.InternalError as e:
             # TODO: remove exception wrap after fix all errors
             self.error(e)
 
-        self.result = [[len(values)]]
-        self.rowcount = len(values)
+        self.connection.invalidate_cache()
+        # Only the written rows are reported
+        self.result = [[written_rows]]
+        self.rowcount = written_rows
 
     def _create_model(self, cmd: Cmd, params: list):
-        self.debug('_create_model %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_create_model %s with %s', cmd, params)
         self._check_or_create_model(cmd['data']['model'])
+        self.connection.invalidate_cache()
 
     def _alter_model(self, cmd: Cmd, params: list):
-        self.debug('_alter_model %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_alter_model %s with %s', cmd, params)
         if cmd['data']['model']:
+            # The altered model is checked again instead of the memoized item
+            self._forget_model(cmd['data']['model']['table_name'])
             self._check_or_create_model(cmd['data']['model'])
+        self.connection.invalidate_cache()
 
     def _field_has_default(self, cmd: Cmd, params: list):
-        self.debug('_field_has_default %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_field_has_default %s with %s', cmd, params)
         self.result = [[None]]
 
     def _table_exists(self, cmd: Cmd, params: list):
-        self.debug('_table_exists %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_table_exists %s with %s', cmd, params)
         self.result = [[None]]
 
     def _sequence_exists(self, cmd: Cmd, params: list):
-        self.debug('_sequence_exists %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_sequence_exists %s with %s', cmd, params)
         self.result = [[None]]
 
     def _enable_constraints(self, cmd: Cmd, params: list):
-        self.debug('_enable_constraints %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_enable_constraints %s with %s', cmd, params)
         self.result = [[None]]
 
     def _disable_constraints(self, cmd: Cmd, params: list):
-        self.debug('_disable_constraints %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_disable_constraints %s with %s', cmd, params)
         self.result = [[None]]
 
     def _create_index(self, cmd: Cmd, params: list):
-        self.debug('_create_index %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_create_index %s with %s', cmd, params)
         self.result = [[None]]
 
     def _get_constraints(self, cmd: Cmd, params: list):
-        self.debug('_get_constraints %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_get_constraints %s with %s', cmd, params)
         # constraint_name, constraint_type, column, other_table, other_column, unique, order, expression
         # self.result = [[ None, None, None, None, None, None, None, None ]]
         self.result = []
 
     def _drop_sequence(self, cmd: Cmd, params: list):
-        self.debug('_drop_sequence %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_drop_sequence %s with %s', cmd, params)
         self.result = [[None]]
 
     def _drop_model(self, cmd: Cmd, params: list):
-        self.debug('_drop_model %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_drop_model %s with %s', cmd, params)
+        self._forget_model(cmd['data']['name'])
+        self.connection.invalidate_cache()
         self.result = [[None]]
 
     def _select(self, cmd: Cmd, params: list):
-        self.debug('_select %s with %s', cmd, params)
+        if self._debug_enabled:
+            self.debug('_select %s with %s', cmd, params)
         for model in cmd['data']['models']:
             self._check_or_create_model(model)
         # ...
-        answer = self.api.execute_sparql_query(
-            cmd['data']['sparql'] % tuple(
-                params) if params else cmd['data']['sparql']
+        answer = self.connection.cached_sparql_query(
+            self.connection.build_parameterized_sparql(
+                cmd['data']['sparql'], params)
         )
-        self.result = self._tuples(
+        self._rows = self._tuples_iter(
             answer['head']['vars'], answer['results']['bindings'])
         self._position = 0
 
@@ -1360,75 +1917,48 @@ class WbCursor(Loggable):
         self.rowcount = 0
         self._position = 0
 
-        if cmd['cmd'] == 'add_property':
-            return self._add_property(cmd, params)
-        if cmd['cmd'] == 'alter_property':
-            return self._alter_property(cmd, params)
-        if cmd['cmd'] == 'add_constraints':
-            return self._add_constraints(cmd, params)
-        if cmd['cmd'] == 'field_indexes':
-            return self._field_indexes(cmd, params)
-        if cmd['cmd'] == 'create_foreignkey_constraint':
-            return self._create_foreignkey_constraint(cmd, params)
-        if cmd['cmd'] == 'show_all_models':
-            return self._show_all_models(cmd, params)
-        if cmd['cmd'] == 'remove_property':
-            return self._remove_property(cmd, params)
-        if cmd['cmd'] == 'savepoint_create':
-            return self._savepoint_create(cmd, params)
-        if cmd['cmd'] == 'savepoint_rollback':
-            return self._savepoint_rollback(cmd, params)
-        if cmd['cmd'] == 'savepoint_commit':
-            return self._savepoint_commit(cmd, params)
-        if cmd['cmd'] == 'add_items':
-            model = cmd['data']['model']
-            concrete_model = self._check_or_create_model(model)
-
-            _, django_autofield_name = self._get_autofield_numeric_property_id_and_django_autofield_name_or_none(
-                model, concrete_model)
+        handler = _DISPATCH.get(cmd['cmd'])
+        if handler is None:
+            raise WbDatabase.InternalError(
+                f'Sorry, but that command {cmd} can\'t execute')
+        return handler(self, cmd, params)
 
-            # split to the two groups (determined autofield values and not determined)
-            determined_auto_field_values = [
-                p for p in params if django_autofield_name in p and p[django_autofield_name]]
-            undetermined_auto_field_values = [p for p in params if not(
-                django_autofield_name in p) or not(p[django_autofield_name])]
-            if undetermined_auto_field_values:
-                return self._add_items(cmd, undetermined_auto_field_values)
-            if determined_auto_field_values:
-                return self._set_items(cmd, determined_auto_field_values)
-        if cmd['cmd'] == 'last_insert_id':
-            return self._last_insert_id(cmd, params)
-        if cmd['cmd'] == 'set_items':
-            return self._set_items(cmd, self._prepare_values_for_update(cmd, params))
-        if cmd['cmd'] == 'create_model':
-            return self._create_model(cmd, params)
-        if cmd['cmd'] == 'alter_model':
-            return self._alter_model(cmd, params)
-        if cmd['cmd'] == 'field_has_default':
-            return self._field_has_default(cmd, params)
-        if cmd['cmd'] == 'create_model':
-            return self._create_model(cmd, params)
-        if cmd['cmd'] == 'table_exists':
-            return self._table_exists(cmd, params)
-        if cmd['cmd'] == 'sequence_exists':
-            return self._sequence_exists(cmd, params)
-        if cmd['cmd'] == 'enable_constraints':
-            return self._enable_constraints(cmd, params)
-        if cmd['cmd'] == 'disable_constraints':
-            return self._disable_constraints(cmd, params)
-        if cmd['cmd'] == 'create_index':
-            return self._create_index(cmd, params)
-        if cmd['cmd'] == 'get_constraints':
-            return self._get_constraints(cmd, params)
-        if cmd['cmd'] == 'drop_sequence':
-            return self._drop_sequence(cmd, params)
-        if cmd['cmd'] == 'drop_model':
-            return self._drop_model(cmd, params)
-        if cmd['cmd'] == 'select':
-            return self._select(cmd, params)
+    def _dispatch_add_items(self, cmd: Cmd, params: list):
+        model = cmd['data']['model']
+        concrete_model = self._check_or_create_model(model)
 
-        raise WbDatabase.InternalError(
-            f'Sorry, but that command {cmd} can\'t execute')
+        _, django_autofield_name = self._get_autofield_numeric_property_id_and_django_autofield_name_or_none(
+            model, concrete_model)
+
+        # split to the two groups (determined autofield values and not determined)
+        determined_auto_field_values, undetermined_auto_field_values = [], []
+        for p in params:
+            (determined_auto_field_values if p.get(django_autofield_name)
+             else undetermined_auto_field_values).append(p)
+        written_rows = 0
+        if undetermined_auto_field_values:
+            self._add_items(cmd, undetermined_auto_field_values)
+            written_rows += self.rowcount
+        if determined_auto_field_values:
+            self._set_items(cmd, determined_auto_field_values)
+            written_rows += self.rowcount
+        if undetermined_auto_field_values and determined_auto_field_values:
+            self.result = [[written_rows]]
+            self.rowcount = written_rows
+
+    def _dispatch_set_items(self, cmd: Cmd, params: list):
+        return self._set_items(cmd, self._prepare_values_for_update(cmd, params))
+
+    @property
+    def result(self) -> List:
+        '''The rows not fetched yet (materialized on access)'''
+        rows = list(self._rows)
+        self._rows = iter(rows)
+        return rows
+
+    @result.setter
+    def result(self, rows: Iterable):
+        self._rows = iter(rows)
 
     def fetchall(self):
         '''Fetch rows from the wikibase
@@ -1436,7 +1966,9 @@ class WbCursor(Loggable):
         Returns:
             List[Tuple]: List of rows from the wikibase
         '''
-        return self.result
+        result = list(self._rows)
+        self._position += len(result)
+        return result
 
     def fetchmany(self, limit: int):
         '''Fetch rows from the wikibase
@@ -1444,21 +1976,62 @@ class WbCursor(Loggable):
         Returns:
             List[Tuple]: List of rows from the wikibase
         '''
-        self._position += limit
-        result = self.result[:limit]
-        self.result = self.result[limit:]
+        result = list(islice(self._rows, limit))
+        self._position += len(result)
         return result
 
     def fetchone(self):
         '''Fetch single row from the wikibase
 
         Returns:
-            Tuple: the row from the wikibase
+            Tuple: the row from the wikibase or None if there are no more rows
         '''
-        return self.result[0]
+        row = next(self._rows, None)
+        if row is not None:
+            self._position += 1
+        return row
+
+
+_SNAK_HANDLERS = {
+    'string': WbCursor._snak_string,
+    'commonsMedia': WbCursor._snak_commons_media,
+    'quantity': WbCursor._snak_quantity,
+    'wikibase-item': WbCursor._snak_wikibase_item,
+    'time': WbCursor._snak_time,
+}
+
+
+_DISPATCH = {
+    'add_property': WbCursor._add_property,
+    'alter_property': WbCursor._alter_property,
+    'add_constraints': WbCursor._add_constraints,
+    'field_indexes': WbCursor._field_indexes,
+    'create_foreignkey_constraint': WbCursor._create_foreignkey_constraint,
+    'show_all_models': WbCursor._show_all_models,
+    'remove_property': WbCursor._remove_property,
+    'savepoint_create': WbCursor._savepoint_create,
+    'savepoint_rollback': WbCursor._savepoint_rollback,
+    'savepoint_commit': WbCursor._savepoint_commit,
+    'add_items': WbCursor._dispatch_add_items,
+    'last_insert_id': WbCursor._last_insert_id,
+    'set_items': WbCursor._dispatch_set_items,
+    'create_model': WbCursor._create_model,
+    'alter_model': WbCursor._alter_model,
+    'field_has_default': WbCursor._field_has_default,
+    'table_exists': WbCursor._table_exists,
+    'sequence_exists': WbCursor._sequence_exists,
+    'enable_constraints': WbCursor._enable_constraints,
+    'disable_constraints': WbCursor._disable_constraints,
+    'create_index': WbCursor._create_index,
+    'get_constraints': WbCursor._get_constraints,
+    'drop_sequence': WbCursor._drop_sequence,
+    'drop_model': WbCursor._drop_model,
+    'select': WbCursor._select,
+}
 
 
 class WbDatabaseConnection(Loggable):
+    CHECK_MODELS_WORKERS = 8
 
     def __init__(self, charset: str, url: str,
                  user: str, password: str,
@@ -1474,157 +2047,244 @@ class WbDatabaseConnection(Loggable):
         self.password = password  # TODO: hash instead plain
         self.django_namespace = django_namespace
 
+        # One query probes all the bootstrap entities, the missed ones are searched (or created) one by one
+        found_entity_ids = self.api.try_search_entities_bulk([
+            WbDatabase._DJANGO_MODEL,
+            WbDatabase._PYTHON_TYPE,
+            WbDatabase._SQL_TABLE,
+            WbDatabase._DJANGO_NAMESPACE,
+            WbDatabase._DJANGO_APPLICATION,
+            WbDatabase._DJANGO_FIELD,
+            WbDatabase._DJANGO_SEQUENCE,
+            WbDatabase._DJANGO_NEXT_ID,
+        ])
+
         if not django_model_item_id:
             # algo: 1. select django model by name 'django model'
             #       2. if not found create the item
             #       3. if found just get the identity
-            django_model_item_id = self.create_item_if_not_found_by_name_and_get_id_without_prefix(
-                WbDatabase._DJANGO_MODEL)
-        django_python_type_property_id = self.create_property_if_not_found_by_name_and_get_id_without_prefix(
-            WbDatabase._PYTHON_TYPE, 'string')
-        django_sql_table_property_id = self.create_property_if_not_found_by_name_and_get_id_without_prefix(
-            WbDatabase._SQL_TABLE, 'string')
-        django_namespace_property_id = self.create_property_if_not_found_by_name_and_get_id_without_prefix(
-            WbDatabase._DJANGO_NAMESPACE, 'string')
-        django_application_property_id = self.create_property_if_not_found_by_name_and_get_id_without_prefix(
-            WbDatabase._DJANGO_APPLICATION, 'string')
-        django_field_property_id = self.create_property_if_not_found_by_name_and_get_id_without_prefix(
-            WbDatabase._DJANGO_FIELD, 'wikibase-property')
-        django_sequence_property_id = self.create_property_if_not_found_by_name_and_get_id_without_prefix(
-            WbDatabase._DJANGO_SEQUENCE, 'wikibase-property')
-        django_next_id_property_id = self.create_property_if_not_found_by_name_and_get_id_without_prefix(
-            WbDatabase._DJANGO_NEXT_ID, 'quantity')
+            django_model_item_id = self._found_entity_id(found_entity_ids, WbDatabase._DJANGO_MODEL, 'Q') or \
+                self.create_item_if_not_found_by_name_and_get_id_without_prefix(
+                    WbDatabase._DJANGO_MODEL)
+        django_python_type_property_id = self._found_or_created_property_id(
+            found_entity_ids, WbDatabase._PYTHON_TYPE, 'string')
+        django_sql_table_property_id = self._found_or_created_property_id(
+            found_entity_ids, WbDatabase._SQL_TABLE, 'string')
+        django_namespace_property_id = self._found_or_created_property_id(
+            found_entity_ids, WbDatabase._DJANGO_NAMESPACE, 'string')
+        django_application_property_id = self._found_or_created_property_id(
+            found_entity_ids, WbDatabase._DJANGO_APPLICATION, 'string')
+        django_field_property_id = self._found_or_created_property_id(
+            found_entity_ids, WbDatabase._DJANGO_FIELD, 'wikibase-property')
+        django_sequence_property_id = self._found_or_created_property_id(
+            found_entity_ids, WbDatabase._DJANGO_SEQUENCE, 'wikibase-property')
+        django_next_id_property_id = self._found_or_created_property_id(
+            found_entity_ids, WbDatabase._DJANGO_NEXT_ID, 'quantity')
 
         mediawiki_info = self.api.mediawiki_info()
         server: str = mediawiki_info['query']['general']['server']
         server_url: str = server if server.endswith('/') else f'{server}/'
         # https://phytonium.qstand.art/api.php?action=query&meta=siteinfo&siprop=extensions&format=json
-        self.wikibase_info = {
-            WbDatabase._BASE_URL: server,
-            WbDatabase._MEDIAWIKI_VERSION: mediawiki_info['query']['general']['generator'],
-            WbDatabase._INSTANCE_OF: WbLink(instance_of_property_id, 'property', server_url),
-            WbDatabase._SUBCLASS_OF: WbLink(subclass_of_property_id, 'property', server_url),
-            WbDatabase._DJANGO_MODEL: WbLink(django_model_item_id, 'item', server_url),
-            WbDatabase._PYTHON_TYPE: WbLink(django_python_type_property_id, 'property', server_url),
-            WbDatabase._SQL_TABLE: WbLink(django_sql_table_property_id, 'property', server_url),
-            WbDatabase._DJANGO_NAMESPACE: WbLink(django_namespace_property_id, 'property', server_url),
-            WbDatabase._DJANGO_APPLICATION: WbLink(django_application_property_id, 'property', server_url),
-            WbDatabase._DJANGO_FIELD: WbLink(django_field_property_id, 'property', server_url),
-            WbDatabase._DJANGO_SEQUENCE: WbLink(django_sequence_property_id, 'property', server_url),
-            WbDatabase._DJANGO_NEXT_ID: WbLink(django_next_id_property_id, 'property', server_url),
-            WbDatabase._DJANGO_MODELS: dict(),
-            WbDatabase._SPARQL_ENDPOINT: wdqs_sparql_endpoint if wdqs_sparql_endpoint else f'{url}/sparql',
-            WbDatabase._WIKIBASE_PROPERTIES: dict(),
-            WbDatabase._WIKIBASE_CREDENTIALS: WbCredentials(user, password)
-        }
-        self.transactions = []
-        self._test_django_application_models()
-
-    def prefixes(self) -> List[str]:
-        return [
+        self.wikibase_info = WikibaseInfo(
+            base_url=server,
+            mediawiki_version=mediawiki_info['query']['general']['generator'],
+            instance_of=WbLink(instance_of_property_id, 'property', server_url),
+            subclass_of=WbLink(subclass_of_property_id, 'property', server_url),
+            django_model=WbLink(django_model_item_id, 'item', server_url),
+            python_type=WbLink(django_python_type_property_id, 'property', server_url),
+            sql_table=WbLink(django_sql_table_property_id, 'property', server_url),
+            django_namespace=WbLink(django_namespace_property_id, 'property', server_url),
+            django_application=WbLink(django_application_property_id, 'property', server_url),
+            django_field=WbLink(django_field_property_id, 'property', server_url),
+            django_sequence=WbLink(django_sequence_property_id, 'property', server_url),
+            django_next_id=WbLink(django_next_id_property_id, 'property', server_url),
+            sparql_endpoint=wdqs_sparql_endpoint if wdqs_sparql_endpoint else f'{url}/sparql',
+            wikibase_properties=WbPropertyCache(self.api),
+            wikibase_credentials=WbCredentials(user, password),
+        )
+        # The prefixes depend on the server url only
+        self._prefixes: List[str] = [
             'PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>',
             'PREFIX bd: <http://www.bigdata.com/rdf#>',
             'PREFIX wikibase: <http://wikiba.se/ontology#>',
-            'PREFIX e: <%s/entity/>' % (
-                self.wikibase_info[WbDatabase._BASE_URL], ),
-            'PREFIX pd: <%s/prop/direct/>' % (
-                self.wikibase_info[WbDatabase._BASE_URL], )
+            f'PREFIX e: <{server}/entity/>',
+            f'PREFIX pd: <{server}/prop/direct/>',
         ]
+        self._prefix_block: str = '\n'.join(self._prefixes)
+        self.transactions = []
+        self._instance_of_expressions: Dict[str, str] = {}
+        # The connection helpers don't fetch rows, so they share one cursor
+        self._internal_cursor = WbCursor(self)
+        self._test_django_application_models()
+
+    def cached_sparql_query(self, sparql_query: str, pin: bool = False) -> Dict:
+        '''Execute the read only query or take its answer from the cache'''
+        # The original query is sent, the canonical one is only the cache key
+        key = (self.wikibase_info.sparql_endpoint, canonical_sparql(sparql_query))
+        answer = _SPARQL_CACHE.get(key)
+        if answer is None:
+            answer = self.api.execute_sparql_query(sparql_query)
+            _SPARQL_CACHE.put(key, answer, pin)
+        return answer
+
+    def invalidate_cache(self):
+        _SPARQL_CACHE.note_write()
+
+    def prefixes(self) -> List[str]:
+        return self._prefixes
 
     def _test_django_application_models(self):
-        test_result = self.api.execute_sparql_query('''
+        test_result = self.cached_sparql_query(self._prefix_block + '''
             # Instance of (Document)
-            PREFIX bd: <http://www.bigdata.com/rdf#>
-            PREFIX wikibase: <http://wikiba.se/ontology#>
-            PREFIX e: <%s/entity/>
-            PREFIX pd: <%s/prop/direct/>
-
-            SELECT ?item ?itemLabel
+            SELECT ?item
             WHERE
             {
                 ?item pd:P%s e:Q%s.
-                SERVICE wikibase:label { bd:serviceParam wikibase:language "[AUTO_LANGUAGE],en". }
             }
 
             LIMIT 100
         ''' % (
-            self.wikibase_info[WbDatabase._BASE_URL],
-            self.wikibase_info[WbDatabase._BASE_URL],
-            self.wikibase_info[WbDatabase._SUBCLASS_OF]['id'],
-            self.wikibase_info[WbDatabase._DJANGO_MODEL]['id']
-        ))
+            self.wikibase_info.subclass_of['id'],
+            self.wikibase_info.django_model['id']
+        ), pin=True)
         # Warm models cache
         # wb_cursor: WbCursor = self.cursor()
         # wb_cursor._show_all_models(Cmd('show_all_models', {}), [])
         # for _,_,model_ref,_,_,_,_ in wb_cursor.result:
         #     wb_cursor.warm_models_cache_entry_from_wikibase(model_ref)
+        all_models = []
         for application, models in apps.all_models.items():
             if models:
                 self.debug(
                     'Load models for application %s into models cache', application)
-                self.check_models(models.values())
+                all_models.extend(models.values())
+        self.check_models(all_models)
         self.debug(dumps(test_result))
 
+    @staticmethod
+    def _found_entity_id(found_entity_ids: Dict[str, List[str]], label: str, entity_prefix: str) -> Optional[int]:
+        entity_ids = [entity_id for entity_id in found_entity_ids.get(label, ())
+                      if entity_id.startswith(entity_prefix)]
+        return entity_numeric_id(entity_ids[0]) if len(entity_ids) == 1 else None
+
+    def _found_or_created_property_id(self, found_entity_ids: Dict[str, List[str]], property_name: str, data_type_name: str) -> int:
+        return self._found_entity_id(found_entity_ids, property_name, 'P') or \
+            self.create_property_if_not_found_by_name_and_get_id_without_prefix(
+                property_name, data_type_name)
+
     def create_item_if_not_found_by_name_and_get_id_without_prefix(self, item_name: str) -> int:
-        entities = self.api.search_items({'label': item_name})
-        if len(entities) == 1:
-            return int(entities[0]['id'][1:])
-        if len(entities) == 0:
-            entity = self.api.new_item(
-                {'labels': {'en': {'language': 'en', 'value': item_name}}})
-            return int(entity['id'][1:])
-        # Exact matching
-        for entity in entities:
-            if entity['label'] == item_name:
-                return int(entity['id'][1:])
-        raise WbDatabase.InternalError(
-            f'The entity {item_name} has another one (i.e. not unique)')
+        # Exact matching (the search also returns the entities with the label prefix)
+        for entity in self.api.search_items({'label': item_name}):
+            if entity.get('label') == item_name:
+                return entity_numeric_id(entity['id'])
+        entity = self.api.new_item(
+            {'labels': {'en': {'language': 'en', 'value': item_name}}})
+        return entity_numeric_id(entity['id'])
 
     def create_property_if_not_found_by_name_and_get_id_without_prefix(self, property_name: str, data_type_name: str):
-        entities = self.api.search_properties({'label': property_name})
-        if len(entities) == 1:
-            return int(entities[0]['id'][1:])
-        if len(entities) == 0:
-            entity = self.api.new_property(
-                {'labels': {'en': {'language': 'en', 'value': property_name}}, 'datatype': data_type_name})
-            return int(entity['id'][1:])
-        # Exact matching
-        for entity in entities:
-            if entity['label'] == property_name:
-                return int(entity['id'][1:])
-        raise WbDatabase.InternalError(
-            f'The entity {property_name} has another one (i.e. not unique)')
+        # Exact matching (the search also returns the entities with the label prefix)
+        for entity in self.api.search_properties({'label': property_name}):
+            if entity.get('label') == property_name:
+                return entity_numeric_id(entity['id'])
+        entity = self.api.new_property(
+            {'labels': {'en': {'language': 'en', 'value': property_name}}, 'datatype': data_type_name})
+        return entity_numeric_id(entity['id'])
 
     def django_model(self, django_table_name: str) -> dict:
-        for table_name, model in self.wikibase_info[WbDatabase._DJANGO_MODELS].items():
-            if table_name == django_table_name:
-                return model
-        raise WbDatabase.InternalError(
-            f'Sorry, I can\'t find django model for {django_table_name} in cache {WbDatabase._DJANGO_MODELS}.')
+        model = self.wikibase_info.django_models.get(django_table_name)
+        if model is None:
+            raise WbDatabase.InternalError(
+                f'Sorry, I can\'t find django model for {django_table_name} in cache {WbDatabase._DJANGO_MODELS}.')
+        return model
 
     def expression_instance_of(self, django_table_name: str) -> str:
-        concrete_model = self.cursor()._check_or_create_model(
-            self.django_model(django_table_name))
-        return f'?{django_table_name} pd:P{self.wikibase_info[WbDatabase._INSTANCE_OF]["id"]} e:Q{int(concrete_model["id"][1:])}'
+        # The model item doesn't change after it was created
+        expression = self._instance_of_expressions.get(django_table_name)
+        if expression is None:
+            concrete_model = self._internal_cursor._check_or_create_model(
+                self.django_model(django_table_name))
+            expression = self._instance_of_expressions[django_table_name] = \
+                f'?{django_table_name} pd:P{self.wikibase_info.instance_of["id"]} e:Q{concrete_model["_numeric_id"]}'
+        return expression
 
     def expression_has_property(self, django_table_name: str, property_name: str) -> str:
-        wikibase_property_id = self.cursor()._get_wikibase_numeric_property_id_or_none(
+        wikibase_property_id = self._internal_cursor._get_wikibase_numeric_property_id_or_none(
             self.django_model(django_table_name), property_name)
         return f'?{django_table_name} pd:P{wikibase_property_id} ?{property_name}'
 
+    def build_parameterized_sparql(self, template: str, params: list) -> str:
+        '''Bind the %s placeholders of the first WHERE group to the VALUES variables ?_p0, ?_p1...
+
+        The VALUES block opens the first WHERE group. The placeholders outside of the group (HAVING,
+        ORDER BY...) and all the placeholders of the template without such group get the escaped literals.
+        '''
+        if not params:
+            return template
+        parts = split_sparql_template(template)
+        if len(parts) != len(params) + 1:
+            raise WbDatabase.InternalError(
+                f'Sorry, the query has {len(parts) - 1} placeholders for {len(params)} parameters: {template}')
+        values = [self.sparql_parameter_value(param) for param in params]
+        where_position = parts[0].find('WHERE {')
+        if where_position < 0:
+            return parts[0] + ''.join(value + part for value, part in zip(values, parts[1:]))
+        where_position += len('WHERE {')
+
+        # The group depth before every placeholder, the placeholder is bound while the group is open
+        depth = _sparql_group_depth(parts[0][where_position:], 1)
+        variables = []
+        bound_values = []
+        for index, (value, part) in enumerate(zip(values, parts[1:])):
+            if depth > 0:
+                variables.append(f'?_p{index}')
+                bound_values.append(value)
+            else:
+                variables.append(value)
+            depth = _sparql_group_depth(part, depth)
+        values_block = f'\n VALUES ({" ".join(variables[:len(bound_values)])}) {{ ({" ".join(bound_values)}) }}\n' \
+            if bound_values else ''
+        return ''.join((
+            parts[0][:where_position],
+            values_block,
+            parts[0][where_position:],
+            *(variable + part for variable, part in zip(variables, parts[1:]))))
+
     def sparql_parameter_value(self, built_in_type_value):
+        if built_in_type_value is None:
+            # SPARQL has no null literal (and UNDEF is allowed in the VALUES only)
+            raise WbDatabase.InternalError(
+                'Sorry, I can\'t put None to the query, use the isnull lookup instead')
         if isinstance(built_in_type_value, str):
-            return "'" + built_in_type_value.replace("'", "\\'") + "'"
+            return "'" + built_in_type_value.translate(_SPARQL_STRING_ESCAPES) + "'"
+        # bool is checked before int, SPARQL has lowercase boolean literals
+        if isinstance(built_in_type_value, bool):
+            return 'true' if built_in_type_value else 'false'
         return str(built_in_type_value)
 
     def db_info(self, key):
         return self.wikibase_info.get(key)
 
     def check_models(self, models: Iterable[Model]):
-        for model in models:
-            if model._meta.db_table in self.wikibase_info[WbDatabase._DJANGO_MODELS]:
+        checked_models = self.wikibase_info.django_models
+        django_models = [DjangoModel(model) for model in models
+                         if model._meta.db_table not in checked_models]
+        check_or_create_model = self._internal_cursor._check_or_create_model
+        # The first model of the application creates the application item, it goes alone
+        applications = set()
+        parallel_django_models = []
+        for django_model in django_models:
+            if django_model['application'] in applications:
+                parallel_django_models.append(django_model)
                 continue
-            self.cursor()._check_or_create_model(DjangoModel(model))
+            applications.add(django_model['application'])
+            check_or_create_model(django_model)
+        if not parallel_django_models:
+            return
+        # The workers resolve the model properties serially, so there are CHECK_MODELS_WORKERS threads at most
+        with ThreadPoolExecutor(max_workers=min(WbDatabaseConnection.CHECK_MODELS_WORKERS, len(parallel_django_models))) as executor:
+            # Consume the results to re-raise the workers exceptions
+            for _ in executor.map(partial(check_or_create_model, parallel_properties=False), parallel_django_models):
+                pass
 
     def cursor(self):
         return WbCursor(self)
@@ -1643,6 +2303,7 @@ class WbDatabaseConnection(Loggable):
 
 
 class TransactionContext:
+    __slots__ = ('connection', )
 
     def __init__(self, connection: WbDatabaseConnection):
         self.connection = connection